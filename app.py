@@ -1,8 +1,21 @@
+import sys
 from flask import Flask
 from flask_cors import CORS
 from flask_login import LoginManager
 from backend.config import Config
-from backend.models import db, User
+from backend.models import (db, User, Service, Stylist, Booking, Message, Counter, BookingRollup,
+                            message_writer, replica_router, user_cache, password_hasher, login_throttle, startup,
+                            catalog, catalog_snapshot)
+from backend.utils.cache import load_detached, share_catalog
+from backend.utils.compression import Compress
+from backend.utils.serializers import init_json
+from backend.utils.schema import ensure_indexes
+from backend.utils.migrations import upgrade
+from backend.utils.search import ensure_message_search
+from backend.utils.storage import init_storage
+from backend.utils.counters import ensure_counters
+from backend.utils.templating import init_bytecode_cache
+from backend.utils.rollups import ensure_rollups
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -10,15 +23,29 @@ def create_app(config_class=Config):
 
     # Initialize extensions
     db.init_app(app)
-    CORS(app)
+    init_storage(app, db)
+    replica_router.init_app(app)
+    CORS(app, expose_headers=['X-Next-Cursor', 'Link'])
+    Compress(app)
+    init_json(app)
+    init_bytecode_cache(app)
+    message_writer.init_app(app)
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
+    startup.init_app(app)
+    share_catalog(app, catalog)
+    catalog_snapshot.init_app(app)
     
     login_manager = LoginManager()
     login_manager.login_view = 'admin.login'
     login_manager.init_app(app)
 
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # Cached identity; dropped when the user row changes (see backend.utils.cache.watch_identities)
+        return user_cache.get_or_load(int(user_id), lambda: load_detached(db, User, int(user_id)))
 
     # Register Blueprints
     from backend.routes.api_public import api_bp
@@ -27,12 +54,60 @@ def create_app(config_class=Config):
     from backend.routes.admin import admin_bp
     app.register_blueprint(admin_bp, url_prefix='/admin')
     
-    # Create DB tables (simplest migration strategy for now)
+    # Create DB tables (simplest migration strategy for now); skipped under
+    # FAST_START while the recorded schema fingerprint matches the models
+    def check_schema():
+        db.create_all(bind_key=None)
+        upgrade(db)
+        ensure_indexes(db)
+        ensure_message_search(db)
+        ensure_counters(db, Counter, Service, Stylist, Booking, Message)
+        ensure_rollups(db, BookingRollup, Booking, Service)
+
     with app.app_context():
-        db.create_all()
+        startup.prepare(check_schema)
+        message_writer.recover()
+    if catalog_snapshot.enabled:
+        catalog_snapshot.rebuild()
+
+    if app.config['WARMUP_ON_START']:
+        startup.warm_up()
+
+    return app
+
+def create_asgi_app(config_class=Config):
+    """The same app behind an ASGI front (uvicorn --factory backend.app:create_asgi_app):
+    public catalog reads on the event loop, everything else on a thread pool."""
+    from backend.models import metrics
+    from backend.utils.asgi import AsyncAPI
+    from backend.routes.api_async import register_async_routes
+    api = AsyncAPI(create_app(config_class), db, catalog)
+    register_async_routes(api)
+    metrics.register('asgi', api.stats)
+    return api
 
+def worker_exit():
+    message_writer.stop()
+    catalog_snapshot.flush()
+
+def preload(config_class=Config):
+    """The app, warmed up and with no open connections, ready to be forked."""
+    app = create_app(config_class)
+    startup.warm_up(wait=True)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
     return app
 
 if __name__ == '__main__':
-    app = create_app()
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    if sys.argv[1:2] == ['serve']:
+        # python -m backend.app serve [--workers N] [--port 5000] [--max-requests N]; SIGHUP reloads
+        from flask import Config as Settings
+        from backend.utils.prefork import serve_command
+        settings = Settings('.')
+        settings.from_object(Config)
+        serve_command(settings, preload, sys.argv[2:], port=5000, check_module='backend.app',
+                      after_fork=startup.warm_up, worker_exit=worker_exit)
+    else:
+        app = create_app()
+        app.run(debug=True, port=5000, host='0.0.0.0')
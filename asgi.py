@@ -0,0 +1,77 @@
+# ASGI entry point for server.py: uvicorn asgi:app --port 5001
+# Public catalog reads run on the event loop with an async engine; admin pages,
+# POSTs and exports go to the same Flask app on a thread pool (see utils/asgi.py).
+from sqlalchemy import select
+from server import app as flask_app, db, catalog, metrics, init_db, startup, Service, Stylist, Testimonial, Offer
+from utils.asgi import AsyncAPI
+from utils.filters import parse_service_filters, service_page_async, service_rows_async
+from utils.pagination import next_page_headers
+from utils.serializers import SERVICE, STYLIST, TESTIMONIAL, OFFER
+
+app = AsyncAPI(flask_app, db, catalog)
+metrics.register('asgi', app.stats)
+
+
+@app.catalog_route('/api/services')
+def services(args):
+    filters = parse_service_filters(args)
+    fields = dict(filters).get('fields')
+    core = 'services' in flask_app.config['CORE_READS']
+    async def load(session):
+        if core:
+            rows, next_cursor = await service_rows_async(session, Service, filters)
+            items = SERVICE.many_rows(rows, fields)
+        else:
+            rows, next_cursor = await service_page_async(session, Service, filters)
+            items = SERVICE.many(rows, fields)
+        return lambda: (items, next_page_headers(next_cursor, filters))
+    return 'services', ('list',) + filters if filters else 'list', load
+
+
+@app.catalog_route('/api/services/<int:id>')
+def service(args, id):
+    async def load(session):
+        s = await session.get(Service, id)
+        item = SERVICE(s) if s is not None else None
+        return lambda: item
+    return 'services', id, load
+
+
+def _listing(table, model, schema, args):
+    # ?fields= as in server._list_response(); a bad value raises and the Flask view answers 400
+    fields = schema.parse_fields(args.get('fields'))
+    core = table in flask_app.config['CORE_READS']
+    if core:
+        query = select(*schema.columns(model, fields))
+    else:
+        query = select(model).options(schema.load_only(model, fields)) if fields else select(model)
+    async def load(session):
+        if core:
+            items = schema.many_rows(await session.execute(query), fields)
+        else:
+            items = schema.many(await session.scalars(query), fields)
+        return lambda: items
+    return table, ('list', ('fields', fields)) if fields else 'list', load
+
+
+@app.catalog_route('/api/stylists')
+def stylists(args):
+    return _listing('stylists', Stylist, STYLIST, args)
+
+
+@app.catalog_route('/api/testimonials')
+def testimonials(args):
+    return _listing('testimonials', Testimonial, TESTIMONIAL, args)
+
+
+@app.catalog_route('/api/offers')
+def offers(args):
+    return _listing('offers', Offer, OFFER, args)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    init_db()
+    if flask_app.config['WARMUP_ON_START']:
+        startup.warm_up()
+    uvicorn.run(app, port=5001, host='0.0.0.0')
@@ -2,8 +2,21 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
 from sqlalchemy.sql import func
+from backend.utils.cache import CatalogCache, TTLCache, watch_models, watch_identities
+from backend.utils.availability import AvailabilityIndex, watch_bookings
+from backend.utils.bookings import watch_booking_times
+from backend.utils.metrics import Metrics
+from backend.utils.writebehind import MessageWriter
+from backend.utils.storage import pool_stats
+from backend.utils.replica import RoutingSession, ReplicaRouter
+from backend.utils.counters import watch_counters
+from backend.utils.rollups import watch_rollups
+from backend.utils.auth import PasswordHasher, LoginThrottle
+from backend.utils.startup import Startup
+from backend.utils.snapshot import CatalogSnapshot
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+catalog = CatalogCache()
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -22,6 +35,12 @@ class Service(db.Model):
     image = db.Column(db.String(512), nullable=False)
     is_featured = db.Column(db.Boolean, default=False)
 
+    # Access paths of /api/services filters, sorts and keyset pages
+    __table_args__ = (
+        db.Index('ix_services_category_price', 'category', 'price', 'id'),
+        db.Index('ix_services_featured_id', 'is_featured', 'id'),
+    )
+
 class Stylist(db.Model):
     __tablename__ = 'stylists'
     id = db.Column(db.Integer, primary_key=True)
@@ -66,10 +85,20 @@ class Booking(db.Model):
     time = db.Column(db.String(50), nullable=False)
     message = db.Column(db.Text)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    # Typed appointment window, derived from date/time and Service.duration on write
+    start_at = db.Column(db.DateTime)
+    end_at = db.Column(db.DateTime)
 
     service = db.relationship('Service', backref='bookings')
     stylist = db.relationship('Stylist', backref='bookings')
 
+    # Admin bookings list is keyset-paginated newest first on (created_at, id)
+    __table_args__ = (
+        db.Index('ix_bookings_created_at_id', 'created_at', 'id'),
+        db.Index('ix_bookings_stylist_start', 'stylist_id', 'start_at'),
+        db.Index('ix_bookings_service_start', 'service_id', 'start_at'),
+    )
+
 class Message(db.Model):
     __tablename__ = 'messages'
     id = db.Column(db.Integer, primary_key=True)
@@ -77,4 +106,69 @@ class Message(db.Model):
     email = db.Column(db.String(255), nullable=False)
     subject = db.Column(db.String(255), nullable=False)
     message = db.Column(db.Text, nullable=False)
+    is_read = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    # Inbox is keyset-paginated newest first; text search goes through messages_fts / FULLTEXT
+    __table_args__ = (db.Index('ix_messages_created_at_id', 'created_at', 'id'),)
+
+# Dashboard counters (row totals, unread messages, bookings per day), kept current by backend.utils.counters
+class Counter(db.Model):
+    __tablename__ = 'counters'
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+# Booked bookings/revenue/minutes per appointment day, service, stylist (0 = none) and category,
+# maintained incrementally by backend.utils.rollups; the primary key doubles as the day-range index
+class BookingRollup(db.Model):
+    __tablename__ = 'booking_rollups'
+    day = db.Column(db.Date, primary_key=True)
+    service_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    stylist_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    category = db.Column(db.String(100), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+
+# Admin writes to these tables invalidate the cached public catalog
+watch_models(db, catalog, Service, Stylist, Testimonial, Offer)
+# Shared by all worker processes; one rebuild per admin write (entries: backend.routes.api_public)
+catalog_snapshot = CatalogSnapshot(db, catalog)
+catalog_snapshot.watch(Service, Stylist, Testimonial, Offer)
+
+# Bookings carry typed start_at/end_at derived from their date/time strings
+watch_booking_times(Booking, Service)
+# Busy intervals per (stylist, date) for /api/availability, updated as bookings commit
+availability = AvailabilityIndex(db, Booking)
+watch_bookings(db, availability, Booking, Service)
+# Dashboard counters maintained in the writing transaction; script/reconcile_counters.py corrects drift
+watch_counters(db, Counter, Service, Stylist, Booking, Message)
+# Daily revenue/utilization rollups for /admin/analytics; script/rebuild_rollups.py backfills
+watch_rollups(db, BookingRollup, Booking, Service)
+# Optional write-behind queue for contact messages; bound to the app in create_app()
+message_writer = MessageWriter(db, Message)
+
+# Logged-in users for the Flask-Login user loader; the TTL is set from USER_CACHE_TTL in create_app()
+user_cache = TTLCache()
+watch_identities(db, user_cache, User)
+
+# Admin login: bounded password-hash pool and per-IP/username throttling; bound in create_app()
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
+
+# Sends @read_only views to the read replica when one is configured; bound in create_app()
+replica_router = ReplicaRouter(db)
+
+# Schema-check skip, warm-up and /healthz/ready; bound in create_app()
+startup = Startup(db)
+
+# Internal stats for /admin/metrics
+metrics = Metrics()
+metrics.register('catalog', catalog.stats)
+metrics.register('catalog_snapshot', catalog_snapshot.stats)
+metrics.register('message_queue', message_writer.stats)
+metrics.register('db_pool', lambda: pool_stats(db.engine))
+metrics.register('replica', replica_router.stats)
+metrics.register('user_cache', user_cache.stats)
+metrics.register('login', lambda: dict(password_hasher.stats(), throttle=login_throttle.stats()))
+metrics.register('startup', startup.stats)
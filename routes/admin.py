@@ -1,7 +1,14 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash
-from backend.models import db, User, Service, Stylist, Testimonial, Offer, Booking, Message
+from backend.models import (db, User, Service, Stylist, Testimonial, Offer, Booking, Message, Counter, BookingRollup,
+                            metrics, password_hasher, login_throttle)
+from backend.utils.filters import parse_booking_filters, booking_page, message_page
+from backend.utils.search import search_messages
+from backend.utils.export import export_response, BOOKING_EXPORT_COLUMNS, MESSAGE_EXPORT_COLUMNS
+from backend.utils.replica import read_only
+from backend.utils.counters import dashboard_stats, mark_all_read
+from backend.utils.rollups import parse_analytics_args, rollup_report, GROUPS
+from backend.utils.auth import Busy
 
 admin_bp = Blueprint('admin', __name__, template_folder='../templates/admin')
 
@@ -13,12 +20,31 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
+        ip = request.remote_addr
+
+        wait = login_throttle.retry_after(ip, username)
+        if wait:
+            flash(f'Too many failed attempts. Try again in {wait} seconds.')
+            return render_template('login.html'), 429, {'Retry-After': str(wait)}
+
         user = User.query.filter_by(username=username).first()
-        
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            # Hash checks run on a bounded pool so a login burst can't starve the API
+            ok, new_hash = password_hasher.verify(user.password_hash, password) if user else (False, None)
+        except Busy:
+            flash('Too many sign-in attempts right now. Please try again in a moment.')
+            return render_template('login.html'), 503, {'Retry-After': '1'}
+
+        if ok:
+            if new_hash:
+                # Stored with an older method/cost; upgrade it while we have the password
+                user.password_hash = new_hash
+                db.session.commit()
+            login_throttle.succeeded(ip, username)
             login_user(user)
             return redirect(url_for('admin.dashboard'))
         else:
+            login_throttle.failed(ip, username)
             flash('Invalid username or password')
             
     return render_template('login.html')
@@ -33,17 +59,14 @@ def logout():
 @admin_bp.route('/dashboard')
 @login_required
 def dashboard():
-    stats = {
-        'services': Service.query.count(),
-        'stylists': Stylist.query.count(),
-        'bookings': Booking.query.count(),
-        'messages': Message.query.count()
-    }
+    # Totals, unread messages and today's/this week's appointments, from the counters table
+    stats = dashboard_stats(db, Counter)
     return render_template('dashboard.html', stats=stats)
 
 # === SERVICES MANAGEMENT ===
 @admin_bp.route('/services')
 @login_required
+@read_only
 def services_list():
     services = Service.query.all()
     return render_template('services_list.html', services=services)
@@ -98,20 +121,105 @@ def services_delete(id):
 # === BOOKINGS VIEW ===
 @admin_bp.route('/bookings')
 @login_required
+@read_only
 def bookings_list():
-    bookings = Booking.query.order_by(Booking.created_at.desc()).all()
-    return render_template('bookings_list.html', bookings=bookings)
+    try:
+        filters = parse_booking_filters(request.args)
+        bookings, next_cursor = booking_page(Booking, filters, request.args.get('cursor'))
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('admin.bookings_list'))
+
+    stylists = Stylist.query.with_entities(Stylist.id, Stylist.name).order_by(Stylist.name).all()
+    services = Service.query.with_entities(Service.id, Service.title).order_by(Service.title).all()
+    return render_template('bookings_list.html', bookings=bookings, next_cursor=next_cursor,
+                           filters=filters, stylists=stylists, services=services)
+
+# === EXPORTS ===
+# ?format=csv|ndjson&columns=id,name,...&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+@admin_bp.route('/bookings/export')
+@login_required
+@read_only
+def bookings_export():
+    try:
+        return export_response(db, Booking, BOOKING_EXPORT_COLUMNS, 'start_at', request.args, 'bookings')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+@admin_bp.route('/messages/export')
+@login_required
+@read_only
+def messages_export():
+    try:
+        return export_response(db, Message, MESSAGE_EXPORT_COLUMNS, 'created_at', request.args, 'messages')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
 # === MESSAGES VIEW ===
 @admin_bp.route('/messages')
 @login_required
+@read_only
 def messages_list():
-    messages = Message.query.order_by(Message.created_at.desc()).all()
-    return render_template('messages_list.html', messages=messages)
+    q = request.args.get('q', '').strip()
+    if q:
+        # Ranked full-text search, paged by number
+        page = max(request.args.get('page', 1, type=int) or 1, 1)
+        messages, has_more = search_messages(db, Message, q, page)
+        return render_template('messages_list.html', messages=messages, q=q, page=page, has_more=has_more)
+
+    try:
+        messages, next_cursor = message_page(Message, request.args.get('cursor'))
+    except ValueError:
+        return redirect(url_for('admin.messages_list'))
+    return render_template('messages_list.html', messages=messages, q='', next_cursor=next_cursor)
+
+@admin_bp.route('/messages/<int:id>/read', methods=['POST'])
+@login_required
+def messages_toggle_read(id):
+    msg = Message.query.get_or_404(id)
+    msg.is_read = not msg.is_read
+    db.session.commit()
+    return redirect(request.referrer or url_for('admin.messages_list'))
+
+@admin_bp.route('/messages/read-all', methods=['POST'])
+@login_required
+def messages_read_all():
+    mark_all_read(db, Message, Counter)
+    return redirect(url_for('admin.messages_list'))
+
+# === ANALYTICS ===
+@admin_bp.route('/analytics')
+@login_required
+@read_only
+def analytics():
+    try:
+        first, last, group = parse_analytics_args(request.args)
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('admin.analytics'))
+    report = rollup_report(db, BookingRollup, Service, Stylist, first, last, group)
+    return render_template('analytics.html', report=report, groups=GROUPS)
+
+@admin_bp.route('/analytics.json')
+@login_required
+@read_only
+def analytics_json():
+    # ?date_from=&date_to=&group_by=day|service|category|stylist
+    try:
+        first, last, group = parse_analytics_args(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(rollup_report(db, BookingRollup, Service, Stylist, first, last, group))
+
+@admin_bp.route('/metrics')
+@login_required
+def metrics_snapshot():
+    return jsonify(metrics.snapshot())
 
 # === STYLISTS MANAGEMENT ===
 @admin_bp.route('/stylists')
 @login_required
+@read_only
 def stylists_list():
     stylists = Stylist.query.all()
     return render_template('stylists_list.html', stylists=stylists)
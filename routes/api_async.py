@@ -0,0 +1,73 @@
+from sqlalchemy import select
+from backend.models import Service, Stylist, Testimonial, Offer
+from backend.utils.filters import parse_service_filters, service_page_async, service_rows_async
+from backend.utils.pagination import next_page_headers
+from backend.utils.serializers import SERVICE, STYLIST, TESTIMONIAL, OFFER
+
+# Async loaders for the public catalog routes of api_bp, used by create_asgi_app().
+# Rules, cache tables/keys and payloads must match the views in api_public.
+
+
+def _one(model, id, schema):
+    async def load(session):
+        obj = await session.get(model, id)
+        item = schema(obj) if obj is not None else None
+        return lambda: item
+    return load
+
+
+def _listing(model, schema, fields, core):
+    if core:
+        query = select(*schema.columns(model, fields))
+        async def load(session):
+            items = schema.many_rows(await session.execute(query), fields)
+            return lambda: items
+        return load
+    query = select(model).options(schema.load_only(model, fields)) if fields else select(model)
+    async def load(session):
+        items = schema.many(await session.scalars(query), fields)
+        return lambda: items
+    return load
+
+
+def _list(api, table, model, schema, args):
+    fields = schema.parse_fields(args.get('fields'))
+    core = table in api.app.config['CORE_READS']
+    return table, ('list', ('fields', fields)) if fields else 'list', _listing(model, schema, fields, core)
+
+
+def register_async_routes(api, prefix='/api'):
+    @api.catalog_route(prefix + '/services')
+    def services(args):
+        filters = parse_service_filters(args)
+        fields = dict(filters).get('fields')
+        core = 'services' in api.app.config['CORE_READS']
+        async def load(session):
+            if core:
+                rows, next_cursor = await service_rows_async(session, Service, filters)
+                items = SERVICE.many_rows(rows, fields)
+            else:
+                rows, next_cursor = await service_page_async(session, Service, filters)
+                items = SERVICE.many(rows, fields)
+            return lambda: (items, next_page_headers(next_cursor, filters))
+        return 'services', ('list',) + filters if filters else 'list', load
+
+    @api.catalog_route(prefix + '/services/<int:id>')
+    def service(args, id):
+        return 'services', id, _one(Service, id, SERVICE)
+
+    @api.catalog_route(prefix + '/stylists')
+    def stylists(args):
+        return _list(api, 'stylists', Stylist, STYLIST, args)
+
+    @api.catalog_route(prefix + '/stylists/<int:id>')
+    def stylist(args, id):
+        return 'stylists', id, _one(Stylist, id, STYLIST)
+
+    @api.catalog_route(prefix + '/testimonials')
+    def testimonials(args):
+        return _list(api, 'testimonials', Testimonial, TESTIMONIAL, args)
+
+    @api.catalog_route(prefix + '/offers')
+    def offers(args):
+        return _list(api, 'offers', Offer, OFFER, args)
@@ -1,100 +1,130 @@
-from flask import Blueprint, jsonify, request
-from backend.models import db, Service, Stylist, Testimonial, Offer, Booking, Message
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import select
+from backend.models import db, catalog, catalog_snapshot, availability, Service, Stylist, Testimonial, Offer, Booking, Message, message_writer
+from backend.utils.responses import catalog_response
+from backend.utils.filters import parse_service_filters, service_page, service_rows
+from backend.utils.pagination import next_page_headers
+from backend.utils.availability import parse_availability_args, availability as free_slots
+from backend.utils.bookings import create_bookings
+from backend.utils.replica import on_primary, read_only
+from backend.utils.serializers import SERVICE, STYLIST, TESTIMONIAL, OFFER
 
 api_bp = Blueprint('api', __name__)
 
 # === SERVICES ===
+# Response shapes are the schemas in backend.utils.serializers, shared with api_async
+def _load_services(filters):
+    fields = dict(filters).get('fields')
+    if 'services' in current_app.config['CORE_READS']:
+        # Plain rows straight into the serializer, no Service instances (CORE_READS)
+        rows, next_cursor = service_rows(db.session, Service, filters)
+        return SERVICE.many_rows(rows, fields), next_page_headers(next_cursor, filters)
+    services, next_cursor = service_page(Service, filters)
+    return SERVICE.many(services, fields), next_page_headers(next_cursor, filters)
+
+def _load_one(model, id, schema):
+    obj = db.session.get(model, id)
+    return schema(obj) if obj is not None else None
+
+def _load_list(model, schema, fields=None):
+    # Only the columns behind `fields` are read; the rest stay deferred
+    if model.__tablename__ in current_app.config['CORE_READS']:
+        return schema.many_rows(db.session.execute(select(*schema.columns(model, fields))), fields)
+    query = model.query.options(schema.load_only(model, fields)) if fields else model.query
+    return schema.many(query.all(), fields)
+
+def _list_response(table, model, schema):
+    # ?fields=id,name,... narrows the list to those keys
+    try:
+        fields = schema.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    key = ('list', ('fields', fields)) if fields else 'list'
+    return catalog_response(catalog, table, key, lambda: _load_list(model, schema, fields))
+
 @api_bp.route('/services', methods=['GET'])
+@read_only
 def get_services():
-    services = Service.query.all()
-    result = []
-    for s in services:
-        result.append({
-            'id': s.id,
-            'title': s.title,
-            'description': s.description,
-            'category': s.category,
-            'price': s.price,
-            'duration': s.duration,
-            'image': s.image,
-            'isFeatured': s.is_featured,
-            'is_featured': s.is_featured # Supporting both casing if needed
-        })
-    return jsonify(result)
+    # Optional filters: category, featured, min_price, max_price, max_duration, sort
+    # Keyset pagination with limit/cursor; the next cursor comes back in X-Next-Cursor
+    # Sparse fieldsets: fields=id,title,price
+    try:
+        filters = parse_service_filters(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    key = ('list',) + filters if filters else 'list'
+    return catalog_response(catalog, 'services', key, lambda: _load_services(filters))
 
 @api_bp.route('/services/<int:id>', methods=['GET'])
+@read_only
 def get_service(id):
-    s = Service.query.get_or_404(id)
-    return jsonify({
-        'id': s.id,
-        'title': s.title,
-        'description': s.description,
-        'category': s.category,
-        'price': s.price,
-        'duration': s.duration,
-        'image': s.image,
-        'isFeatured': s.is_featured
-    })
+    return catalog_response(catalog, 'services', id, lambda: _load_one(Service, id, SERVICE))
 
 # === STYLISTS ===
 @api_bp.route('/stylists', methods=['GET'])
+@read_only
 def get_stylists():
-    stylists = Stylist.query.all()
-    result = []
-    for s in stylists:
-        result.append({
-            'id': s.id,
-            'name': s.name,
-            'role': s.role,
-            'bio': s.bio,
-            'image': s.image,
-            'specialties': s.get_specialties_list()
-        })
-    return jsonify(result)
+    return _list_response('stylists', Stylist, STYLIST)
 
 @api_bp.route('/stylists/<int:id>', methods=['GET'])
+@read_only
 def get_stylist(id):
-    s = Stylist.query.get_or_404(id)
-    return jsonify({
-        'id': s.id,
-        'name': s.name,
-        'role': s.role,
-        'bio': s.bio,
-        'image': s.image,
-        'specialties': s.get_specialties_list()
-    })
+    return catalog_response(catalog, 'stylists', id, lambda: _load_one(Stylist, id, STYLIST))
 
 # === TESTIMONIALS ===
 @api_bp.route('/testimonials', methods=['GET'])
+@read_only
 def get_testimonials():
-    testimonials = Testimonial.query.all()
-    result = []
-    for t in testimonials:
-        result.append({
-            'id': t.id,
-            'name': t.name,
-            'role': t.role,
-            'content': t.content,
-            'rating': t.rating,
-            'avatar': t.avatar
-        })
-    return jsonify(result)
+    return _list_response('testimonials', Testimonial, TESTIMONIAL)
 
 # === OFFERS ===
 @api_bp.route('/offers', methods=['GET'])
+@read_only
 def get_offers():
-    offers = Offer.query.all()
-    result = []
-    for o in offers:
-        result.append({
-            'id': o.id,
-            'title': o.title,
-            'description': o.description,
-            'code': o.code,
-            'discount': o.discount,
-            'expiry': o.expiry
-        })
-    return jsonify(result)
+    return _list_response('offers', Offer, OFFER)
+
+# === SHARED SNAPSHOT ===
+@catalog_snapshot.entries
+def _snapshot_entries():
+    # Same tables, keys and payloads as the views above; filtered service pages
+    # are left to the per-process cache
+    yield 'services', 'list', _load_services(())
+    for s in Service.query.all():
+        yield 'services', s.id, SERVICE(s)
+    stylists = _load_list(Stylist, STYLIST)
+    yield 'stylists', 'list', stylists
+    for item in stylists:
+        yield 'stylists', item['id'], item
+    yield 'testimonials', 'list', _load_list(Testimonial, TESTIMONIAL)
+    yield 'offers', 'list', _load_list(Offer, OFFER)
+
+# === AVAILABILITY ===
+@api_bp.route('/availability', methods=['GET'])
+def get_availability():
+    # ?serviceId=&date=YYYY-MM-DD, optionally &stylistId= and &days= (up to AVAILABILITY_MAX_DAYS)
+    try:
+        service_id, stylist_id, first, days = parse_availability_args(
+            request.args, current_app.config['AVAILABILITY_MAX_DAYS'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # Cached lookups are filled from the primary, never a lagging replica
+    with on_primary():
+        duration = catalog.get_or_load('services', ('duration', service_id),
+                                       lambda: db.session.query(Service.duration).filter(Service.id == service_id).scalar())
+        if duration is None:
+            return jsonify({'message': 'Service not found'}), 404
+        if stylist_id:
+            stylist_ids = [stylist_id]
+        else:
+            stylist_ids = catalog.get_or_load('stylists', 'ids',
+                                              lambda: [i for (i,) in db.session.query(Stylist.id).order_by(Stylist.id)])
+
+    return jsonify({
+        'serviceId': service_id,
+        'duration': duration,
+        'days': free_slots(availability, stylist_ids, first, days, duration, current_app.config)
+    })
 
 # === BOOKINGS ===
 @api_bp.route('/bookings', methods=['POST'])
@@ -130,6 +160,20 @@ def create_booking():
     except Exception as e:
         return jsonify({'message': str(e)}), 400
 
+@api_bp.route('/bookings/batch', methods=['POST'])
+def create_bookings_batch():
+    # Body is a list of bookings, or {"bookings": [...], "mode": "atomic" | "best_effort"}
+    data = request.get_json(silent=True)
+    if data is not None and not isinstance(data, (list, dict)):
+        return jsonify({'message': 'Expected a list of bookings or an object with "bookings"'}), 400
+    if isinstance(data, list):
+        items, mode = data, 'atomic'
+    else:
+        data = data or {}
+        items, mode = data.get('bookings'), data.get('mode', 'atomic')
+    status, payload = create_bookings(db, Booking, Service, Stylist, items, request.args.get('mode', mode))
+    return jsonify(payload), status
+
 # === MESSAGES ===
 @api_bp.route('/messages', methods=['POST'])
 def create_message():
@@ -140,12 +184,11 @@ def create_message():
             if field not in data:
                 return jsonify({'message': f'Missing field: {field}'}), 400
 
-        msg = Message(
-            name=data['name'],
-            email=data['email'],
-            subject=data['subject'],
-            message=data['message']
-        )
+        row = {field: data[field] for field in required_fields}
+        if message_writer.submit(row):
+            return jsonify({'status': 'queued'}), 202
+
+        msg = Message(**row)
         db.session.add(msg)
         db.session.commit()
         
@@ -0,0 +1,97 @@
+import sys
+import os
+import asyncio
+import statistics
+import subprocess
+import time
+
+# Compares how the threaded WSGI server (what app.run() uses) and the ASGI
+# front (asgi.py under uvicorn) cope with many slow clients. SLOW_CLIENTS
+# connections trickle their request headers in over HOLD seconds while a
+# fast client keeps requesting /api/services; reported are the fast
+# client's latency, the server's thread count and RSS, and how many slow
+# clients were answered. Uses DATABASE_URL like server.py does.
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'backend'))
+SLOW_CLIENTS = [int(n) for n in os.environ.get('SLOW_CLIENTS', '100,500,1000').split(',')]
+HOLD = float(os.environ.get('HOLD', 3))
+PORT = int(os.environ.get('BENCH_PORT', 5090))
+
+SERVERS = {
+    'wsgi (threaded)': [sys.executable, '-c', 'import sys; sys.path.append(%r); import server; from werkzeug.serving '
+                        'import run_simple; run_simple("127.0.0.1", %d, server.app, threaded=True)' % (BACKEND, PORT)],
+    'asgi (uvicorn)': [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(PORT), '--log-level', 'warning',
+                       '--backlog', '4096'],
+}
+
+
+def proc_status(pid):
+    with open('/proc/%d/status' % pid) as f:
+        fields = dict(line.split(':', 1) for line in f)
+    return int(fields['Threads']), int(fields['VmRSS'].split()[0]) // 1024
+
+
+async def request(path='/api/services'):
+    reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+    writer.write(('GET %s HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n' % path).encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data.split(b' ', 2)[1] if data else b'---'
+
+
+async def slow_client(hold):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+        writer.write(b'GET /api/services HTTP/1.1\r\nHost: bench\r\n')
+        for i in range(5):
+            await asyncio.sleep(hold / 5)
+            writer.write(b'X-Slow-%d: 1\r\n' % i)
+            await writer.drain()
+        writer.write(b'Connection: close\r\n\r\n')
+        data = await reader.read()
+        writer.close()
+        return data.startswith(b'HTTP/1.1 200') or data.startswith(b'HTTP/1.0 200')
+    except OSError:
+        return False
+
+
+async def scenario(pid, slow):
+    tasks = [asyncio.ensure_future(slow_client(HOLD)) for _ in range(slow)]
+    await asyncio.sleep(HOLD / 2)
+    threads, rss = proc_status(pid)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + HOLD / 2
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            ok = await asyncio.wait_for(request(), timeout=5) == b'200'
+        except (OSError, asyncio.TimeoutError):
+            ok = False
+        latencies.append((time.perf_counter() - started) * 1000)
+        errors += not ok
+    answered = sum(await asyncio.gather(*tasks))
+    return threads, rss, latencies, errors, answered
+
+
+def bench():
+    for name, command in SERVERS.items():
+        server = subprocess.Popen(command, cwd=BACKEND, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                try:
+                    asyncio.run(request())
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            print(name)
+            for slow in SLOW_CLIENTS:
+                threads, rss, latencies, errors, answered = asyncio.run(scenario(server.pid, slow))
+                print(f"  {slow:5} slow clients: {threads:5} threads, {rss:4} MB RSS | fast client "
+                      f"p50 {statistics.median(latencies):6.1f} ms, max {max(latencies):7.1f} ms, "
+                      f"{errors} errors | slow clients answered {answered}/{slow}")
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,83 @@
+import sys
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+# Per-request cost of the public list endpoints on a large catalog, reading
+# ORM instances (the default) versus plain Core rows (CORE_READS). Each
+# request runs the full view with the catalog cache emptied first, so the
+# query, the rows, serialization and JSON encoding are all counted. Reported
+# are CPU time per request and the peak memory allocated while serving one.
+# The catalog is built in a throwaway SQLite database.
+ROWS = int(os.environ.get('BENCH_ROWS', 10000))
+ROUNDS = int(os.environ.get('BENCH_ROUNDS', 20))
+URLS = ('/api/services', '/api/services?fields=id,title,price', '/api/services?sort=price&limit=100', '/api/stylists')
+
+workdir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///%s' % os.path.join(workdir, 'bench.db')
+os.environ['CATALOG_SNAPSHOT_PATH'] = ''
+
+# Add the backend directory to sys.path so we can import from server
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'backend')))
+
+from server import app, db, catalog, init_db, Service, Stylist
+
+
+def populate():
+    init_db()
+    with app.app_context():
+        db.session.execute(Service.__table__.insert(), [
+            {'title': 'Service %d' % i, 'description': 'A relaxing treatment with our senior team. ' * 6,
+             'category': ('Hair', 'Nails', 'Skin')[i % 3], 'price': 2000 + i % 9000, 'duration': 30 + i % 90,
+             'image': 'https://images.example.com/services/%d.jpg?auto=format&fit=crop&w=500&q=60' % i,
+             'is_featured': i % 7 == 0} for i in range(ROWS)])
+        db.session.execute(Stylist.__table__.insert(), [
+            {'name': 'Stylist %d' % i, 'role': 'Senior Stylist', 'bio': 'Expert in modern cuts and colour. ' * 6,
+             'image': 'https://images.example.com/stylists/%d.jpg' % i, 'specialties': 'Hair,Color,Bridal'}
+            for i in range(ROWS)])
+        db.session.commit()
+
+
+def request(client, url):
+    catalog.clear()
+    response = client.get(url)
+    assert response.status_code == 200, response.status_code
+    return response.data
+
+
+def measure(client, url):
+    request(client, url)
+    cpu = []
+    for _ in range(ROUNDS):
+        started = time.process_time()
+        request(client, url)
+        cpu.append((time.process_time() - started) * 1000)
+    tracemalloc.start()
+    request(client, url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(cpu), peak / 2**20
+
+
+def bench():
+    populate()
+    client = app.test_client()
+    print(f"{ROWS} services and stylists, median of {ROUNDS} requests")
+    for url in URLS:
+        results = {}
+        for mode, tables in (('orm', ()), ('core', ('services', 'stylists'))):
+            app.config['CORE_READS'] = tables
+            results[mode] = measure(client, url), request(client, url)
+        assert results['orm'][1] == results['core'][1], 'bodies differ for %s' % url
+        (orm_cpu, orm_peak), (core_cpu, core_peak) = results['orm'][0], results['core'][0]
+        print(f"{url:38} orm {orm_cpu:7.1f} ms CPU, {orm_peak:6.1f} MB peak | core {core_cpu:7.1f} ms CPU, "
+              f"{core_peak:6.1f} MB peak | {orm_cpu / core_cpu:4.1f}x CPU, {orm_peak / core_peak:4.1f}x memory")
+
+if __name__ == "__main__":
+    try:
+        bench()
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,50 @@
+import sys
+import os
+import json
+import statistics
+import subprocess
+import time
+
+# Measures worker cold start: a fresh interpreter importing server, running
+# init_db() and the warm-up, with and without FAST_START. Exits 1 when the
+# fast-start median is over STARTUP_BUDGET_MS, so it can gate a deploy.
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'backend'))
+ROUNDS = int(os.environ.get('BENCH_ROUNDS', 5))
+BUDGET_MS = int(os.environ.get('STARTUP_BUDGET_MS', 2000))
+
+CHILD = """
+import sys, json
+sys.path.append(%r)
+import server
+server.init_db()
+server.startup.warm_up(wait=True)
+print(json.dumps(server.startup.stats()))
+""" % BACKEND
+
+
+def start_once(fast):
+    env = dict(os.environ, FAST_START='1' if fast else '0')
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True, check=True).stdout
+    wall_ms = (time.perf_counter() - started) * 1000
+    return wall_ms, json.loads(out.strip().splitlines()[-1])
+
+
+def bench():
+    start_once(False)  # records the schema fingerprint (and creates/seeds a new database)
+    results = {}
+    for fast in (False, True):
+        runs = [start_once(fast) for _ in range(ROUNDS)]
+        walls = [wall for wall, _ in runs]
+        readies = [stats['ready_ms'] for _, stats in runs]
+        results[fast] = statistics.median(readies)
+        last = runs[-1][1]
+        print(f"FAST_START={int(fast)}  process wall {statistics.median(walls):7.1f} ms | "
+              f"ready {results[fast]:7.1f} ms | schema check: {last['schema_check']} | phases {last['phases']}")
+    if results[True] > BUDGET_MS:
+        print(f"Over budget: {results[True]:.0f} ms > STARTUP_BUDGET_MS={BUDGET_MS}")
+        sys.exit(1)
+    print(f"Within budget ({BUDGET_MS} ms)")
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,63 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+
+# Add the backend directory to sys.path so we can import from server
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'backend')))
+
+from flask import render_template, render_template_string
+from jinja2 import FileSystemBytecodeCache
+from server import app, Service, Booking, Stylist, TPL_SERVICES, TPL_BOOKINGS
+from utils.filters import booking_page
+
+ROUNDS = int(os.environ.get('BENCH_ROUNDS', 500))
+
+
+def timed(fn, rounds=ROUNDS):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def cold(name, context, bytecode_cache):
+    # A fresh worker: nothing compiled in memory yet
+    app.jinja_env.cache.clear()
+    app.jinja_env.bytecode_cache = bytecode_cache
+    started = time.perf_counter()
+    render_template(name, **context)
+    return (time.perf_counter() - started) * 1000
+
+
+def bench():
+    with app.app_context():
+        bookings, next_cursor = booking_page(Booking, {}, None)
+        pages = [
+            ('services', TPL_SERVICES, 'services_list.html', {'services': Service.query.all()}),
+            ('bookings', TPL_BOOKINGS, 'bookings_list.html',
+             {'bookings': bookings, 'next_cursor': next_cursor, 'filters': {},
+              'stylists': Stylist.query.all(), 'services': Service.query.all()}),
+        ]
+    cache_dir = tempfile.mkdtemp()
+    original_cache = app.jinja_env.bytecode_cache
+    try:
+        for page, source, name, context in pages:
+            with app.test_request_context('/admin/%s' % page):
+                before = timed(lambda: render_template_string(source, **context))
+                render_template(name, **context)
+                after = timed(lambda: render_template(name, **context))
+                compile_ms = cold(name, context, None)
+                bcc = FileSystemBytecodeCache(cache_dir)
+                cold(name, context, bcc)  # populate the disk cache
+                cached_ms = cold(name, context, bcc)
+            print(f"{page:9} render_template_string {before:7.3f} ms/render | "
+                  f"render_template {after:7.3f} ms/render | "
+                  f"cold start: compile {compile_ms:6.2f} ms, bytecode cache {cached_ms:6.2f} ms")
+    finally:
+        app.jinja_env.bytecode_cache = original_cache
+        shutil.rmtree(cache_dir)
+
+if __name__ == "__main__":
+    bench()
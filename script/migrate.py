@@ -0,0 +1,20 @@
+import sys
+import os
+
+# Add the backend directory to sys.path so we can import from server
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'backend')))
+
+from server import app, db
+from utils.migrations import upgrade, current_version, SCHEMA_VERSION
+from utils.schema import ensure_indexes
+
+def migrate():
+    # Run ahead of a deploy so large backfills don't delay the first worker start
+    with app.app_context():
+        print(f"Schema version {current_version(db)}, latest {SCHEMA_VERSION}")
+        upgrade(db)
+        ensure_indexes(db)
+        print(f"Schema is at version {current_version(db)}")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,19 @@
+import sys
+import os
+import time
+
+# Add the backend directory to sys.path so we can import from server
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'backend')))
+
+from server import app, db, BookingRollup, Booking, Service
+from utils.rollups import rebuild_rollups
+
+def rebuild():
+    # Full backfill from the bookings table; also picks up service price/duration changes
+    with app.app_context():
+        started = time.perf_counter()
+        rows = rebuild_rollups(db, BookingRollup, Booking, Service)
+        print(f"Rebuilt {rows} rollup rows in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,19 @@
+import sys
+import os
+
+# Add the backend directory to sys.path so we can import from server
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'backend')))
+
+from server import app, db, Counter, Service, Stylist, Booking, Message
+from utils.counters import reconcile
+
+def reconcile_counters():
+    # Run from cron (e.g. nightly); the counters are maintained incrementally in between
+    with app.app_context():
+        drift = reconcile(db, Counter, Service, Stylist, Booking, Message)
+        for name, (old, new) in sorted(drift.items()):
+            print(f"{name}: {old} -> {new}")
+        print(f"Counters reconciled, {len(drift)} corrected")
+
+if __name__ == "__main__":
+    reconcile_counters()
@@ -7,7 +7,7 @@ app = create_app()
 def init_db():
     with app.app_context():
         # Create tables
-        db.create_all()
+        db.create_all(bind_key=None)
         print("Database tables created.")
 
         # Create default admin if not exists
@@ -1,19 +1,46 @@
 import os
-from flask import Flask, jsonify, request, redirect, url_for, flash, render_template_string, send_file
+import sys
+from flask import Flask, jsonify, request, redirect, url_for, flash, render_template, send_file
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin, LoginManager, login_user, logout_user, login_required, current_user
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
 from datetime import datetime
+from sqlalchemy import select
 from sqlalchemy.sql import func
 from jinja2 import DictLoader
+from utils.cache import CatalogCache, share_catalog, watch_models, TTLCache, load_detached, watch_identities
+from utils.responses import catalog_response
+from utils.compression import Compress
+from utils.filters import parse_service_filters, service_page, service_rows, parse_booking_filters, booking_page, message_page
+from utils.search import ensure_message_search, search_messages
+from utils.availability import AvailabilityIndex, watch_bookings, parse_availability_args, availability
+from utils.bookings import watch_booking_times, create_bookings
+from utils.migrations import upgrade
+from utils.export import export_response, BOOKING_EXPORT_COLUMNS, MESSAGE_EXPORT_COLUMNS
+from utils.pagination import next_page_headers
+from utils.schema import ensure_indexes
+from utils.metrics import Metrics
+from utils.writebehind import MessageWriter
+from utils.storage import engine_options, init_storage, pool_stats
+from utils.replica import RoutingSession, ReplicaRouter, on_primary, read_only, replica_binds
+from utils.counters import watch_counters, ensure_counters, dashboard_stats, mark_all_read
+from utils.rollups import watch_rollups, ensure_rollups, parse_analytics_args, rollup_report, GROUPS
+from utils.auth import PasswordHasher, LoginThrottle, Busy
+from utils.templating import init_bytecode_cache
+from utils.startup import Startup
+from utils.prefork import serve_command
+from utils.snapshot import CatalogSnapshot
+from utils.serializers import init_json, SERVICE, STYLIST, TESTIMONIAL, OFFER
 
 # ==========================================
 # CONFIGURATION & SETUP
 # ==========================================
 app = Flask(__name__)
 # Enable CORS for all routes to allow frontend to communicate from any origin (e.g. local file)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'Link'])
+# gzip/brotli negotiation; thresholds and levels via COMPRESS_* config keys
+Compress(app)
 
 @app.route('/')
 def home():
@@ -27,10 +54,57 @@ def home():
 # URI format: sqlite:///salon.db (No password needed for demo)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///salon.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Storage profile from the URL: pool options for MySQL, WAL + pragmas for SQLite (utils/storage.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+# Optional read replica for @read_only views; REPLICA_MAX_LAG seconds of lag tolerated (utils/replica.py)
+app.config['SQLALCHEMY_BINDS'] = replica_binds(os.environ.get('REPLICA_DATABASE_URL'))
+app.config['REPLICA_MAX_LAG'] = float(os.environ.get('REPLICA_MAX_LAG', 2))
 app.config['SECRET_KEY'] = 'dev-secret-key-salon-chic-single-file'
 app.config['CLIENT_URL'] = os.environ.get('CLIENT_URL', 'https://limegreen-nightingale-466886.hostingersite.com/')
+# Cache-Control per public catalog endpoint; 'no-cache' still lets browsers/CDN revalidate with the ETag
+app.config['CACHE_CONTROL'] = {
+    'services': os.environ.get('CACHE_CONTROL_SERVICES', 'public, no-cache'),
+    'stylists': os.environ.get('CACHE_CONTROL_STYLISTS', 'public, no-cache'),
+    'testimonials': os.environ.get('CACHE_CONTROL_TESTIMONIALS', 'public, max-age=300'),
+    'offers': os.environ.get('CACHE_CONTROL_OFFERS', 'public, no-cache'),
+}
+# JSON encoding of API responses: 'orjson' (if installed) or 'json' (utils/serializers.py)
+app.config['JSON_BACKEND'] = os.environ.get('JSON_BACKEND', 'orjson')
+init_json(app)
+# Catalog tables whose list endpoints read plain Core rows instead of ORM instances, e.g. CORE_READS=services,stylists
+app.config['CORE_READS'] = tuple(t for t in os.environ.get('CORE_READS', '').split(',') if t)
+# Booking availability: opening hours per weekday (Mon=0), optional per-stylist overrides {stylist_id: {weekday: (open, close)}}
+app.config['WORKING_HOURS'] = {d: ('09:00', '19:00') for d in range(6)}
+app.config['WORKING_HOURS'][6] = None
+app.config['STYLIST_HOURS'] = {}
+app.config['AVAILABILITY_SLOT_MINUTES'] = 15
+app.config['AVAILABILITY_MAX_DAYS'] = 14
+# Contact messages: queue and group-commit in the background instead of one commit per post (see utils/writebehind.py)
+app.config['WRITE_BEHIND_ENABLED'] = os.environ.get('WRITE_BEHIND_ENABLED', '0') == '1'
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+# Admin login: password hashes are checked on a bounded pool, failures throttled per IP/username (utils/auth.py)
+app.config['LOGIN_HASH_WORKERS'] = int(os.environ.get('LOGIN_HASH_WORKERS', 2))
+app.config['LOGIN_MAX_ATTEMPTS_USER'] = 5
+app.config['LOGIN_MAX_ATTEMPTS_IP'] = 20
+# Cold start: FAST_START=1 skips the schema/seed checks while the schema fingerprint matches;
+# /healthz/ready is 503 until the warm-up is done, which should take under STARTUP_BUDGET_MS (utils/startup.py)
+app.config['FAST_START'] = os.environ.get('FAST_START', '0') == '1'
+app.config['STARTUP_BUDGET_MS'] = int(os.environ.get('STARTUP_BUDGET_MS', 2000))
+# ASGI mode (asgi.py): async driver URL (derived from DATABASE_URL if unset), threads for the WSGI-only routes
+app.config['ASYNC_DATABASE_URL'] = os.environ.get('ASYNC_DATABASE_URL')
+app.config['ASYNC_WSGI_THREADS'] = int(os.environ.get('ASYNC_WSGI_THREADS', 16))
+# `python server.py serve`: worker processes (0 = 2 x CPUs + 1), recycled after SERVE_MAX_REQUESTS (utils/prefork.py)
+app.config['SERVE_WORKERS'] = int(os.environ.get('SERVE_WORKERS', 0))
+app.config['SERVE_MAX_REQUESTS'] = int(os.environ.get('SERVE_MAX_REQUESTS', 10000))
+app.config['SERVE_GRACEFUL_TIMEOUT'] = int(os.environ.get('SERVE_GRACEFUL_TIMEOUT', 30))
+# Catalog cache bumps reach every worker through this file ('' = this process only, utils/cache.py)
+app.config['CATALOG_REVISIONS_PATH'] = os.environ.get('CATALOG_REVISIONS_PATH', os.path.join(app.instance_path, 'catalog.revisions'))
+# Catalog responses serialized once into a file every worker mmaps ('' = per-process cache only, utils/snapshot.py)
+app.config['CATALOG_SNAPSHOT_PATH'] = os.environ.get('CATALOG_SNAPSHOT_PATH', os.path.join(app.instance_path, 'catalog.snapshot'))
 
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+init_storage(app, db)
+replica_router = ReplicaRouter(db, app)
 login_manager = LoginManager()
 login_manager.login_view = 'login'
 login_manager.init_app(app)
@@ -55,6 +129,12 @@ class Service(db.Model):
     image = db.Column(db.String(512), nullable=False)
     is_featured = db.Column(db.Boolean, default=False)
 
+    # Access paths of /api/services filters, sorts and keyset pages
+    __table_args__ = (
+        db.Index('ix_services_category_price', 'category', 'price', 'id'),
+        db.Index('ix_services_featured_id', 'is_featured', 'id'),
+    )
+
 class Stylist(db.Model):
     __tablename__ = 'stylists'
     id = db.Column(db.Integer, primary_key=True)
@@ -99,10 +179,20 @@ class Booking(db.Model):
     time = db.Column(db.String(50), nullable=False)
     message = db.Column(db.Text)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    # Typed appointment window, derived from date/time and Service.duration on write
+    start_at = db.Column(db.DateTime)
+    end_at = db.Column(db.DateTime)
     
     service = db.relationship('Service')
     stylist = db.relationship('Stylist')
 
+    # Admin bookings list is keyset-paginated newest first on (created_at, id)
+    __table_args__ = (
+        db.Index('ix_bookings_created_at_id', 'created_at', 'id'),
+        db.Index('ix_bookings_stylist_start', 'stylist_id', 'start_at'),
+        db.Index('ix_bookings_service_start', 'service_id', 'start_at'),
+    )
+
 class Message(db.Model):
     __tablename__ = 'messages'
     id = db.Column(db.Integer, primary_key=True)
@@ -110,11 +200,69 @@ class Message(db.Model):
     email = db.Column(db.String(255), nullable=False)
     subject = db.Column(db.String(255), nullable=False)
     message = db.Column(db.Text, nullable=False)
+    is_read = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
 
+    # Inbox is keyset-paginated newest first; text search goes through messages_fts / FULLTEXT
+    __table_args__ = (db.Index('ix_messages_created_at_id', 'created_at', 'id'),)
+
+# Dashboard counters (row totals, unread messages, bookings per day), kept current by utils/counters.py
+class Counter(db.Model):
+    __tablename__ = 'counters'
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+# Booked bookings/revenue/minutes per appointment day, service, stylist (0 = none) and category,
+# maintained incrementally by utils/rollups.py; the primary key doubles as the day-range index
+class BookingRollup(db.Model):
+    __tablename__ = 'booking_rollups'
+    day = db.Column(db.Date, primary_key=True)
+    service_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    stylist_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    category = db.Column(db.String(100), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+
+# Logged-in users are cached for USER_CACHE_TTL seconds instead of queried on every admin request
+user_cache = TTLCache(ttl=app.config['USER_CACHE_TTL'])
+watch_identities(db, user_cache, User)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get_or_load(int(user_id), lambda: load_detached(db, User, int(user_id)))
+
+# Catalog reads are served from memory; admin writes bump the table revision
+catalog = CatalogCache()
+watch_models(db, catalog, Service, Stylist, Testimonial, Offer)
+share_catalog(app, catalog)
+# ...and from one snapshot file shared by all workers, rebuilt once per admin write
+catalog_snapshot = CatalogSnapshot(db, catalog, app)
+catalog_snapshot.watch(Service, Stylist, Testimonial, Offer)
+# Bookings carry typed start_at/end_at derived from their date/time strings
+watch_booking_times(Booking, Service)
+# Busy intervals per (stylist, date) for /api/availability, updated as bookings commit
+availability_index = AvailabilityIndex(db, Booking)
+watch_bookings(db, availability_index, Booking, Service)
+# Dashboard counters maintained in the writing transaction; script/reconcile_counters.py corrects drift
+watch_counters(db, Counter, Service, Stylist, Booking, Message)
+# Daily revenue/utilization rollups for /admin/analytics; script/rebuild_rollups.py backfills
+watch_rollups(db, BookingRollup, Booking, Service)
+# Optional write-behind queue for contact messages
+message_writer = MessageWriter(db, Message, app)
+# Internal stats for /admin/metrics
+metrics = Metrics()
+metrics.register('catalog', catalog.stats)
+metrics.register('catalog_snapshot', catalog_snapshot.stats)
+metrics.register('message_queue', message_writer.stats)
+metrics.register('db_pool', lambda: pool_stats(db.engine))
+metrics.register('replica', replica_router.stats)
+metrics.register('user_cache', user_cache.stats)
+password_hasher = PasswordHasher(app)
+login_throttle = LoginThrottle(app)
+metrics.register('login', lambda: dict(password_hasher.stats(), throttle=login_throttle.stats()))
+startup = Startup(db, app)
+metrics.register('startup', startup.stats)
 
 # ==========================================
 # ADMIN TEMPLATES (EMBEDDED)
@@ -223,6 +371,11 @@ TPL_BASE = """
                     <i class="bi bi-chat-right-text-fill"></i> Messages
                 </a>
             </li>
+            <li class="nav-item">
+                <a class="nav-link {{ 'active' if 'analytics' in request.endpoint else '' }}" href="{{ url_for('analytics') }}">
+                    <i class="bi bi-bar-chart-fill"></i> Analytics
+                </a>
+            </li>
         </ul>
     </nav>
 
@@ -345,12 +498,47 @@ TPL_DASHBOARD = """
             <div class="card-body d-flex justify-content-between align-items-center">
                 <div>
                     <h5 class="stat-value">{{ stats.messages }}</h5>
-                    <p class="stat-label">New Messages</p>
+                    <p class="stat-label">Messages</p>
                 </div>
                 <div class="stat-icon"><i class="bi bi-envelope"></i></div>
             </div>
         </div>
     </div>
+    <div class="col-md-4">
+        <div class="card stat-card h-100">
+            <div class="card-body d-flex justify-content-between align-items-center">
+                <div>
+                    <h5 class="stat-value">{{ stats.bookings_today }}</h5>
+                    <p class="stat-label">Appointments Today</p>
+                </div>
+                <div class="stat-icon"><i class="bi bi-calendar-day"></i></div>
+            </div>
+        </div>
+    </div>
+    <div class="col-md-4">
+        <div class="card stat-card h-100">
+            <div class="card-body d-flex justify-content-between align-items-center">
+                <div>
+                    <h5 class="stat-value">{{ stats.bookings_week }}</h5>
+                    <p class="stat-label">Appointments This Week</p>
+                </div>
+                <div class="stat-icon"><i class="bi bi-calendar-week"></i></div>
+            </div>
+        </div>
+    </div>
+    <div class="col-md-4">
+        <a href="{{ url_for('messages_list') }}" class="text-decoration-none">
+        <div class="card stat-card h-100">
+            <div class="card-body d-flex justify-content-between align-items-center">
+                <div>
+                    <h5 class="stat-value">{{ stats.unread }}</h5>
+                    <p class="stat-label">Unread Messages</p>
+                </div>
+                <div class="stat-icon"><i class="bi bi-envelope-exclamation"></i></div>
+            </div>
+        </div>
+        </a>
+    </div>
 </div>
 {% endblock %}
 """
@@ -565,8 +753,46 @@ TPL_BOOKINGS = """
 {% block content %}
 <div class="page-header">
     <h1 class="page-title">Appointment Bookings</h1>
-    <button class="btn btn-outline-primary" onclick="window.print()"><i class="bi bi-printer"></i> Print</button>
+    <div class="d-flex gap-2">
+        <a href="{{ url_for('bookings_export', format='csv', date_from=filters.date_from, date_to=filters.date_to) }}" class="btn btn-outline-secondary"><i class="bi bi-download"></i> CSV</a>
+        <a href="{{ url_for('bookings_export', format='ndjson', date_from=filters.date_from, date_to=filters.date_to) }}" class="btn btn-outline-secondary"><i class="bi bi-download"></i> NDJSON</a>
+        <button class="btn btn-outline-primary" onclick="window.print()"><i class="bi bi-printer"></i> Print</button>
+    </div>
 </div>
+<form method="GET" class="card p-3 mb-4">
+    <div class="row g-3 align-items-end">
+        <div class="col-md-2">
+            <label class="form-label small text-muted">From</label>
+            <input type="date" class="form-control" name="date_from" value="{{ filters.date_from or '' }}">
+        </div>
+        <div class="col-md-2">
+            <label class="form-label small text-muted">To</label>
+            <input type="date" class="form-control" name="date_to" value="{{ filters.date_to or '' }}">
+        </div>
+        <div class="col-md-3">
+            <label class="form-label small text-muted">Stylist</label>
+            <select class="form-select" name="stylist_id">
+                <option value="">All stylists</option>
+                {% for st in stylists %}
+                <option value="{{ st.id }}" {{ 'selected' if filters.stylist_id == st.id else '' }}>{{ st.name }}</option>
+                {% endfor %}
+            </select>
+        </div>
+        <div class="col-md-3">
+            <label class="form-label small text-muted">Service</label>
+            <select class="form-select" name="service_id">
+                <option value="">All services</option>
+                {% for sv in services %}
+                <option value="{{ sv.id }}" {{ 'selected' if filters.service_id == sv.id else '' }}>{{ sv.title }}</option>
+                {% endfor %}
+            </select>
+        </div>
+        <div class="col-md-2 d-flex gap-2">
+            <button type="submit" class="btn btn-primary flex-grow-1">Filter</button>
+            <a href="{{ url_for('bookings_list') }}" class="btn btn-outline-secondary">Reset</a>
+        </div>
+    </div>
+</form>
 <div class="table-responsive table-custom">
     <table class="table table-hover mb-0">
         <thead>
@@ -604,10 +830,20 @@ TPL_BOOKINGS = """
             <td>{{ b.phone }}</td>
             <td class="small text-muted">{{ b.created_at.strftime('%Y-%m-%d') }}</td>
         </tr>
+        {% else %}
+        <tr><td colspan="6" class="text-center text-muted py-4">No bookings found.</td></tr>
         {% endfor %}
         </tbody>
     </table>
 </div>
+<div class="d-flex justify-content-between mt-3">
+    {% if request.args.get('cursor') %}
+        <a href="{{ url_for('bookings_list', **filters) }}" class="btn btn-outline-secondary"><i class="bi bi-chevron-double-left"></i> Newest</a>
+    {% else %}<span></span>{% endif %}
+    {% if next_cursor %}
+        <a href="{{ url_for('bookings_list', cursor=next_cursor, **filters) }}" class="btn btn-outline-secondary">Older <i class="bi bi-chevron-right"></i></a>
+    {% endif %}
+</div>
 {% endblock %}
 """
 
@@ -616,7 +852,16 @@ TPL_MESSAGES = """
 {% block content %}
 <div class="page-header">
     <h1 class="page-title">Inbox</h1>
+    <form method="GET" class="d-flex gap-2">
+        <button type="submit" formaction="{{ url_for('messages_read_all') }}" formmethod="POST" class="btn btn-outline-secondary text-nowrap"><i class="bi bi-check2-all"></i> Mark all read</button>
+        <a href="{{ url_for('messages_export', format='csv') }}" class="btn btn-outline-secondary text-nowrap"><i class="bi bi-download"></i> CSV</a>
+        <input type="search" class="form-control" name="q" value="{{ q }}" placeholder="Search name, email, subject, message">
+        <button type="submit" class="btn btn-primary"><i class="bi bi-search"></i></button>
+    </form>
 </div>
+{% if q %}
+<p class="text-muted">Results for <strong>{{ q }}</strong> &middot; <a href="{{ url_for('messages_list') }}">clear</a></p>
+{% endif %}
 <div class="row g-3">
     {% for m in messages %}
     <div class="col-12">
@@ -627,17 +872,92 @@ TPL_MESSAGES = """
             <div class="flex-grow-1">
                 <div class="d-flex justify-content-between">
                     <div>
-                        <h6 class="mb-0 fw-bold">{{ m.subject }}</h6>
+                        <h6 class="mb-0 {{ 'fw-bold' if not m.is_read else '' }}">{% if not m.is_read %}<span class="badge bg-primary me-1">New</span>{% endif %}{{ m.subject }}</h6>
                         <span class="small text-muted">From: {{ m.name }} &lt;{{ m.email }}&gt;</span>
                     </div>
-                    <small class="text-muted">{{ m.created_at.strftime('%b %d, %I:%M %p') }}</small>
+                    <div class="text-end">
+                        <small class="text-muted d-block">{{ m.created_at.strftime('%b %d, %I:%M %p') }}</small>
+                        <form action="{{ url_for('messages_toggle_read', id=m.id) }}" method="POST">
+                            <button type="submit" class="btn btn-link btn-sm p-0">{{ 'Mark unread' if m.is_read else 'Mark read' }}</button>
+                        </form>
+                    </div>
                 </div>
                 <p class="mt-2 mb-0 text-secondary bg-light p-2 rounded" style="font-size:0.95rem">{{ m.message }}</p>
             </div>
         </div>
     </div>
+    {% else %}
+    <div class="col-12 text-center text-muted py-4">No messages found.</div>
     {% endfor %}
 </div>
+<div class="d-flex justify-content-between mt-3">
+    {% if q %}
+        {% if page > 1 %}<a href="{{ url_for('messages_list', q=q, page=page - 1) }}" class="btn btn-outline-secondary"><i class="bi bi-chevron-left"></i> Previous</a>{% else %}<span></span>{% endif %}
+        {% if has_more %}<a href="{{ url_for('messages_list', q=q, page=page + 1) }}" class="btn btn-outline-secondary">Next <i class="bi bi-chevron-right"></i></a>{% endif %}
+    {% else %}
+        {% if request.args.get('cursor') %}<a href="{{ url_for('messages_list') }}" class="btn btn-outline-secondary"><i class="bi bi-chevron-double-left"></i> Newest</a>{% else %}<span></span>{% endif %}
+        {% if next_cursor %}<a href="{{ url_for('messages_list', cursor=next_cursor) }}" class="btn btn-outline-secondary">Older <i class="bi bi-chevron-right"></i></a>{% endif %}
+    {% endif %}
+</div>
+{% endblock %}
+"""
+
+TPL_ANALYTICS = """
+{% extends "base.html" %}
+{% block content %}
+<div class="page-header">
+    <h1 class="page-title">Analytics</h1>
+    <a href="{{ url_for('analytics_json', date_from=report.date_from, date_to=report.date_to, group_by=report.group_by) }}" class="btn btn-outline-secondary"><i class="bi bi-filetype-json"></i> JSON</a>
+</div>
+<form method="GET" class="card p-3 mb-4">
+    <div class="row g-2 align-items-end">
+        <div class="col-md-3">
+            <label class="form-label small text-muted">From</label>
+            <input type="date" class="form-control" name="date_from" value="{{ report.date_from }}">
+        </div>
+        <div class="col-md-3">
+            <label class="form-label small text-muted">To</label>
+            <input type="date" class="form-control" name="date_to" value="{{ report.date_to }}">
+        </div>
+        <div class="col-md-3">
+            <label class="form-label small text-muted">Group by</label>
+            <select class="form-select" name="group_by">
+                {% for g in groups %}<option value="{{ g }}" {{ 'selected' if report.group_by == g else '' }}>{{ g | capitalize }}</option>{% endfor %}
+            </select>
+        </div>
+        <div class="col-md-3"><button type="submit" class="btn btn-primary w-100">Show</button></div>
+    </div>
+</form>
+<div class="row g-4 mb-4">
+    <div class="col-md-4"><div class="card stat-card"><div class="card-body">
+        <h5 class="stat-value">{{ report.totals.bookings }}</h5><p class="stat-label">Bookings</p>
+    </div></div></div>
+    <div class="col-md-4"><div class="card stat-card"><div class="card-body">
+        <h5 class="stat-value">₹{{ "%.2f"|format(report.totals.revenue_cents / 100) }}</h5><p class="stat-label">Booked Revenue</p>
+    </div></div></div>
+    <div class="col-md-4"><div class="card stat-card"><div class="card-body">
+        <h5 class="stat-value">{{ "%.1f"|format(report.totals.minutes / 60) }} h</h5><p class="stat-label">Booked Time</p>
+    </div></div></div>
+</div>
+<div class="table-responsive table-custom">
+    <table class="table table-hover mb-0">
+        <thead>
+            <tr><th>{{ report.group_by | capitalize }}</th><th class="text-end">Bookings</th><th class="text-end">Revenue</th><th class="text-end">Hours</th></tr>
+        </thead>
+        <tbody>
+            {% for row in report.rows %}
+            <tr>
+                <td>{{ row.label }}</td>
+                <td class="text-end">{{ row.bookings }}</td>
+                <td class="text-end">₹{{ "%.2f"|format(row.revenue_cents / 100) }}</td>
+                <td class="text-end">{{ "%.1f"|format(row.minutes / 60) }}</td>
+            </tr>
+            {% else %}
+            <tr><td colspan="4" class="text-center text-muted py-4">No bookings in this range.</td></tr>
+            {% endfor %}
+        </tbody>
+    </table>
+</div>
 {% endblock %}
 """
 
@@ -652,12 +972,24 @@ app.config['SESSION_COOKIE_SECURE'] = False
 def login():
     if current_user.is_authenticated: return redirect(url_for('dashboard'))
     if request.method == 'POST':
-        user = User.query.filter_by(username=request.form.get('username')).first()
-        if user and check_password_hash(user.password_hash, request.form.get('password')):
+        ip, username = request.remote_addr, request.form.get('username')
+        wait = login_throttle.retry_after(ip, username)
+        if wait:
+            flash('Too many failed attempts. Try again in %d seconds.' % wait)
+            return render_template('login.html', client_url=app.config['CLIENT_URL']), 429, {'Retry-After': str(wait)}
+        user = User.query.filter_by(username=username).first()
+        try: ok, new_hash = password_hasher.verify(user.password_hash, request.form.get('password')) if user else (False, None)
+        except Busy:
+            flash('Too many sign-in attempts right now. Please try again in a moment.')
+            return render_template('login.html', client_url=app.config['CLIENT_URL']), 503, {'Retry-After': '1'}
+        if ok:
+            if new_hash: user.password_hash = new_hash; db.session.commit()  # stored with an older method/cost
+            login_throttle.succeeded(ip, username)
             login_user(user)
             return redirect(url_for('dashboard'))
+        login_throttle.failed(ip, username)
         flash('Invalid credentials')
-    return render_template_string(TPL_LOGIN, client_url=app.config['CLIENT_URL'])
+    return render_template('login.html', client_url=app.config['CLIENT_URL'])
 
 @app.route('/admin/logout')
 @login_required
@@ -672,14 +1004,13 @@ def logout():
 @app.route('/admin/dashboard')
 @login_required
 def dashboard():
-    stats = { 'services': Service.query.count(), 'stylists': Stylist.query.count(), 
-              'bookings': Booking.query.count(), 'messages': Message.query.count() }
-    return render_template_string(TPL_DASHBOARD, stats=stats)
+    return render_template('dashboard.html', stats=dashboard_stats(db, Counter))
 
 # Services CRUD
 @app.route('/admin/services')
 @login_required
-def services_list(): return render_template_string(TPL_SERVICES, services=Service.query.all())
+@read_only
+def services_list(): return render_template('services_list.html', services=Service.query.all())
 
 @app.route('/admin/services/new', methods=['GET', 'POST'])
 @login_required
@@ -690,7 +1021,7 @@ def services_create():
                     is_featured='is_featured' in request.form)
         db.session.add(s); db.session.commit()
         return redirect(url_for('services_list'))
-    return render_template_string(TPL_SERVICE_FORM, service=None)
+    return render_template('services_form.html', service=None)
 
 @app.route('/admin/services/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -702,7 +1033,7 @@ def services_edit(id):
         s.is_featured = 'is_featured' in request.form
         db.session.commit()
         return redirect(url_for('services_list'))
-    return render_template_string(TPL_SERVICE_FORM, service=s)
+    return render_template('services_form.html', service=s)
 
 @app.route('/admin/services/<int:id>/delete', methods=['POST'])
 @login_required
@@ -711,7 +1042,8 @@ def services_delete(id): db.session.delete(Service.query.get_or_404(id)); db.ses
 # Stylists CRUD
 @app.route('/admin/stylists')
 @login_required
-def stylists_list(): return render_template_string(TPL_STYLISTS, stylists=Stylist.query.all())
+@read_only
+def stylists_list(): return render_template('stylists_list.html', stylists=Stylist.query.all())
 
 @app.route('/admin/stylists/new', methods=['GET', 'POST'])
 @login_required
@@ -721,7 +1053,7 @@ def stylists_create():
                     image=request.form['image'], specialties=request.form['specialties'])
         db.session.add(s); db.session.commit()
         return redirect(url_for('stylists_list'))
-    return render_template_string(TPL_STYLIST_FORM, stylist=None)
+    return render_template('stylists_form.html', stylist=None)
 
 @app.route('/admin/stylists/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -732,7 +1064,7 @@ def stylists_edit(id):
         s.image = request.form['image']; s.specialties = request.form['specialties']
         db.session.commit()
         return redirect(url_for('stylists_list'))
-    return render_template_string(TPL_STYLIST_FORM, stylist=s)
+    return render_template('stylists_form.html', stylist=s)
 
 @app.route('/admin/stylists/<int:id>/delete', methods=['POST'])
 @login_required
@@ -741,30 +1073,159 @@ def stylists_delete(id): db.session.delete(Stylist.query.get_or_404(id)); db.ses
 # Listings
 @app.route('/admin/bookings')
 @login_required
-def bookings_list(): return render_template_string(TPL_BOOKINGS, bookings=Booking.query.order_by(Booking.created_at.desc()).all())
+@read_only
+def bookings_list():
+    try:
+        filters = parse_booking_filters(request.args)
+        bookings, next_cursor = booking_page(Booking, filters, request.args.get('cursor'))
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('bookings_list'))
+    return render_template('bookings_list.html', bookings=bookings, next_cursor=next_cursor, filters=filters,
+                                  stylists=Stylist.query.with_entities(Stylist.id, Stylist.name).order_by(Stylist.name).all(),
+                                  services=Service.query.with_entities(Service.id, Service.title).order_by(Service.title).all())
+
+# Exports: ?format=csv|ndjson&columns=id,name,...&date_from=&date_to= (appointment date / received date)
+@app.route('/admin/bookings/export')
+@login_required
+@read_only
+def bookings_export():
+    try: return export_response(db, Booking, BOOKING_EXPORT_COLUMNS, 'start_at', request.args, 'bookings')
+    except ValueError as e: return jsonify({'message': str(e)}), 400
+
+@app.route('/admin/messages/export')
+@login_required
+@read_only
+def messages_export():
+    try: return export_response(db, Message, MESSAGE_EXPORT_COLUMNS, 'created_at', request.args, 'messages')
+    except ValueError as e: return jsonify({'message': str(e)}), 400
 
 @app.route('/admin/messages')
 @login_required
-def messages_list(): return render_template_string(TPL_MESSAGES, messages=Message.query.order_by(Message.created_at.desc()).all())
+@read_only
+def messages_list():
+    q = request.args.get('q', '').strip()
+    if q:
+        page = request.args.get('page', 1, type=int) or 1
+        messages, has_more = search_messages(db, Message, q, max(page, 1))
+        return render_template('messages_list.html', messages=messages, q=q, page=max(page, 1), has_more=has_more)
+    try: messages, next_cursor = message_page(Message, request.args.get('cursor'))
+    except ValueError: return redirect(url_for('messages_list'))
+    return render_template('messages_list.html', messages=messages, q='', next_cursor=next_cursor)
+
+@app.route('/admin/messages/<int:id>/read', methods=['POST'])
+@login_required
+def messages_toggle_read(id):
+    m = Message.query.get_or_404(id); m.is_read = not m.is_read; db.session.commit()
+    return redirect(request.referrer or url_for('messages_list'))
+
+@app.route('/admin/messages/read-all', methods=['POST'])
+@login_required
+def messages_read_all(): mark_all_read(db, Message, Counter); return redirect(url_for('messages_list'))
+
+@app.route('/admin/analytics')
+@login_required
+@read_only
+def analytics():
+    try: first, last, group = parse_analytics_args(request.args)
+    except ValueError as e:
+        flash(str(e)); return redirect(url_for('analytics'))
+    report = rollup_report(db, BookingRollup, Service, Stylist, first, last, group)
+    return render_template('analytics.html', report=report, groups=GROUPS)
+
+@app.route('/admin/analytics.json')
+@login_required
+@read_only
+def analytics_json():
+    # ?date_from=&date_to=&group_by=day|service|category|stylist
+    try: first, last, group = parse_analytics_args(request.args)
+    except ValueError as e: return jsonify({'message': str(e)}), 400
+    return jsonify(rollup_report(db, BookingRollup, Service, Stylist, first, last, group))
+
+@app.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    return jsonify(metrics.snapshot())
 
 # ==========================================
 # ROUTES: PUBLIC API
 # ==========================================
+# Response shapes are the schemas in utils/serializers.py, shared with asgi.py
+
 @app.route('/api/services', methods=['GET'])
-def api_services(): return jsonify([{
-    'id':s.id, 'title':s.title, 'description':s.description, 'category':s.category, 
-    'price':s.price, 'duration':s.duration, 'image':s.image, 'isFeatured':s.is_featured
-} for s in Service.query.all()])
+@read_only
+def api_services():
+    # ?category=&featured=&min_price=&max_price=&max_duration=&sort=, keyset pages with ?limit=&cursor=, ?fields=id,title,...
+    try: filters = parse_service_filters(request.args)
+    except ValueError as e: return jsonify({'message': str(e)}), 400
+    return catalog_response(catalog, 'services', ('list',) + filters if filters else 'list', lambda: _load_services(filters))
 
 @app.route('/api/services/<int:id>', methods=['GET'])
+@read_only
 def api_service(id):
-    s = Service.query.get_or_404(id)
-    return jsonify({'id':s.id, 'title':s.title, 'description':s.description, 'category':s.category, 'price':s.price, 'image':s.image})
+    return catalog_response(catalog, 'services', id, lambda: _load_service(id))
 
 @app.route('/api/stylists', methods=['GET'])
-def api_stylists(): return jsonify([{
-    'id':s.id, 'name':s.name, 'role':s.role, 'bio':s.bio, 'image':s.image, 'specialties':s.get_specialties_list()
-} for s in Stylist.query.all()])
+@read_only
+def api_stylists(): return _list_response('stylists', Stylist, STYLIST)
+
+@app.route('/api/testimonials', methods=['GET'])
+@read_only
+def api_testimonials(): return _list_response('testimonials', Testimonial, TESTIMONIAL)
+
+@app.route('/api/offers', methods=['GET'])
+@read_only
+def api_offers(): return _list_response('offers', Offer, OFFER)
+
+def _list_response(table, model, schema):
+    # ?fields=id,name,... loads and sends just those columns
+    try: fields = schema.parse_fields(request.args.get('fields'))
+    except ValueError as e: return jsonify({'message': str(e)}), 400
+    return catalog_response(catalog, table, ('list', ('fields', fields)) if fields else 'list', lambda: _load_list(model, schema, fields))
+
+def _load_list(model, schema, fields=None):
+    if model.__tablename__ in app.config['CORE_READS']:
+        return schema.many_rows(db.session.execute(select(*schema.columns(model, fields))), fields)
+    query = model.query.options(schema.load_only(model, fields)) if fields else model.query
+    return schema.many(query.all(), fields)
+
+def _load_services(filters):
+    fields = dict(filters).get('fields')
+    if 'services' in app.config['CORE_READS']:
+        rows, next_cursor = service_rows(db.session, Service, filters)
+        return SERVICE.many_rows(rows, fields), next_page_headers(next_cursor, filters)
+    services, next_cursor = service_page(Service, filters)
+    return SERVICE.many(services, fields), next_page_headers(next_cursor, filters)
+
+def _load_service(id):
+    s = db.session.get(Service, id)
+    return SERVICE(s) if s is not None else None
+
+
+@catalog_snapshot.entries
+def _snapshot_entries():
+    # Unfiltered listings and every service detail; filtered pages stay in the per-process cache
+    yield 'services', 'list', _load_services(())
+    for s in Service.query.all():
+        yield 'services', s.id, SERVICE(s)
+    yield 'stylists', 'list', _load_list(Stylist, STYLIST)
+    yield 'testimonials', 'list', _load_list(Testimonial, TESTIMONIAL)
+    yield 'offers', 'list', _load_list(Offer, OFFER)
+
+@app.route('/api/availability', methods=['GET'])
+def api_availability():
+    # ?serviceId=&date=YYYY-MM-DD[&stylistId=][&days=14]
+    try: service_id, stylist_id, first, days = parse_availability_args(request.args, app.config['AVAILABILITY_MAX_DAYS'])
+    except ValueError as e: return jsonify({'message': str(e)}), 400
+    # Cached lookups are filled from the primary, never a lagging replica
+    with on_primary():
+        duration = catalog.get_or_load('services', ('duration', service_id),
+                                       lambda: db.session.query(Service.duration).filter(Service.id == service_id).scalar())
+        if duration is None: return jsonify({'message': 'Service not found'}), 404
+        stylist_ids = [stylist_id] if stylist_id else catalog.get_or_load(
+            'stylists', 'ids', lambda: [i for (i,) in db.session.query(Stylist.id).order_by(Stylist.id)])
+    return jsonify({'serviceId': service_id, 'duration': duration,
+                    'days': availability(availability_index, stylist_ids, first, days, duration, app.config)})
 
 @app.route('/api/bookings', methods=['POST'])
 def api_create_booking():
@@ -776,11 +1237,22 @@ def api_create_booking():
         return jsonify({'id': b.id, 'status': 'confirmed'}), 201
     except Exception as e: return jsonify({'message': str(e)}), 400
 
+@app.route('/api/bookings/batch', methods=['POST'])
+def api_create_bookings_batch():
+    # Body: [booking, ...] or {"bookings": [...], "mode": "atomic" | "best_effort"}
+    data = request.get_json(silent=True)
+    if data is not None and not isinstance(data, (list, dict)): return jsonify({'message': 'Expected a list of bookings or an object with "bookings"'}), 400
+    items, mode = (data, 'atomic') if isinstance(data, list) else ((data or {}).get('bookings'), (data or {}).get('mode', 'atomic'))
+    status, payload = create_bookings(db, Booking, Service, Stylist, items, request.args.get('mode', mode))
+    return jsonify(payload), status
+
 @app.route('/api/messages', methods=['POST'])
 def api_create_message():
     data = request.json
     try:
-        m = Message(name=data['name'], email=data['email'], subject=data['subject'], message=data['message'])
+        row = {'name': data['name'], 'email': data['email'], 'subject': data['subject'], 'message': data['message']}
+        if message_writer.submit(row): return jsonify({'status': 'queued'}), 202
+        m = Message(**row)
         db.session.add(m); db.session.commit()
         return jsonify({'id': m.id, 'status': 'sent'}), 201
     except Exception as e: return jsonify({'message': str(e)}), 400
@@ -788,7 +1260,8 @@ def api_create_message():
 # ==========================================
 # TEMPLATE HELPERS
 # ==========================================
-# Helper to resolve "extends" blocks via DictLoader
+# Admin pages render these by name, so each is compiled once per process (and cached
+# on disk as bytecode for the next cold start) instead of re-parsed on every request
 app.jinja_loader = DictLoader({
     'base.html': TPL_BASE,
     'login.html': TPL_LOGIN,
@@ -798,8 +1271,10 @@ app.jinja_loader = DictLoader({
     'stylists_list.html': TPL_STYLISTS,
     'stylists_form.html': TPL_STYLIST_FORM,
     'bookings_list.html': TPL_BOOKINGS,
-    'messages_list.html': TPL_MESSAGES
+    'messages_list.html': TPL_MESSAGES,
+    'analytics.html': TPL_ANALYTICS
 })
+init_bytecode_cache(app)
 
 # ==========================================
 # SEED DATA
@@ -824,15 +1299,46 @@ def seed_data():
     
     db.session.commit()
 
+def check_schema():
+    db.create_all(bind_key=None)  # primary only; never run DDL against the read replica
+    upgrade(db)
+    ensure_indexes(db)
+    ensure_message_search(db)
+    ensure_counters(db, Counter, Service, Stylist, Booking, Message)
+    ensure_rollups(db, BookingRollup, Booking, Service)
+    if not User.query.filter_by(username='admin').first():
+        db.session.add(User(username='admin', password_hash=generate_password_hash('admin123')))
+        db.session.commit()
+        print("Admin user created.")
+    seed_data() # Add demo data
+
 def init_db():
     with app.app_context():
-        db.create_all()
-        if not User.query.filter_by(username='admin').first():
-            db.session.add(User(username='admin', password_hash=generate_password_hash('admin123')))
-            db.session.commit()
-            print("Admin user created.")
-        seed_data() # Add demo data
+        startup.prepare(check_schema)  # skipped under FAST_START when the schema is current
+        message_writer.recover()
+    if catalog_snapshot.enabled:
+        catalog_snapshot.rebuild()
 
-if __name__ == '__main__':
+def worker_exit():
+    message_writer.stop()
+    catalog_snapshot.flush()
+
+def preload():
+    # Runs once in the prefork master: workers are forked with templates compiled and the catalog cached
     init_db()
-    app.run(debug=True, port=5001, host='0.0.0.0')
+    startup.warm_up(wait=True)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()  # no connection may be shared across fork
+    return app
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['serve']:
+        # python server.py serve [--workers N] [--port 5001] [--max-requests N]; SIGHUP reloads, SIGTERM stops
+        serve_command(app.config, preload, sys.argv[2:], port=5001, check_module='server',
+                      after_fork=startup.warm_up, worker_exit=worker_exit)
+    else:
+        init_db()
+        if app.config['WARMUP_ON_START']:
+            startup.warm_up()
+        app.run(debug=True, port=5001, host='0.0.0.0')
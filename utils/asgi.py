@@ -0,0 +1,250 @@
+import asyncio
+import io
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+from werkzeug.wrappers import Request
+from .responses import CachedBody
+from .storage import apply_pragmas, engine_options, pool_stats
+
+log = logging.getLogger(__name__)
+
+# Sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'mysql': 'mysql+aiomysql', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_url(url):
+    """The asyncio-driver equivalent of a SQLAlchemy URL."""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope and its (fully read) body."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        key = name.upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = 'HTTP_' + key
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class AsyncAPI:
+    """ASGI front for the Flask app, for many concurrent slow clients.
+
+    Catalog reads registered with catalog_route() never hold a thread: a
+    cache miss is loaded on the event loop through an async engine (the
+    same models, an asyncio driver for the same database) and stored in the
+    app's CatalogCache; the Flask view then runs inline on the loop and is
+    a pure cache hit, so headers, ETags, compression and CORS stay exactly
+    those of the WSGI app. Everything else (admin pages, POSTs, exports) is
+    handed to the unchanged WSGI app on a pool of ASYNC_WSGI_THREADS
+    threads, streaming its response back.
+    """
+
+    def __init__(self, app, db, cache):
+        self.app = app
+        self.cache = cache
+        app.config.setdefault('ASYNC_DATABASE_URL', None)
+        app.config.setdefault('ASYNC_WSGI_THREADS', 16)
+        with app.app_context():
+            url = app.config['ASYNC_DATABASE_URL'] or async_url(db.engine.url)
+        self.engine = create_async_engine(url, **engine_options(url))
+        if self.engine.dialect.name == 'sqlite':
+            apply_pragmas(self.engine.sync_engine, app.config['SQLITE_PRAGMAS'])
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.executor = ThreadPoolExecutor(app.config['ASYNC_WSGI_THREADS'], thread_name_prefix='wsgi')
+        self.routes = Map()
+        self._inflight = {}
+        self.served = {'async': 0, 'threaded': 0}
+
+    def catalog_route(self, rule):
+        """Register fn(args, **view_args) -> (table, key, load) for GET `rule`.
+
+        `rule` and (table, key) must match what the Flask view passes to
+        catalog_response(). `load(session)` is a coroutine returning a
+        callable that builds the view's payload; it is called inside a
+        request context, so it may use url_for()/next_page_headers(). Let
+        ValueError out for bad arguments: the Flask view then answers 400.
+        """
+        def decorator(fn):
+            self.routes.add(Rule(rule, endpoint=fn, methods=['GET']))
+            return fn
+        return decorator
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        environ = wsgi_environ(scope, body)
+        ready = await self._prefetch(environ)
+        response = self._run_inline(environ, ready) if ready else None
+        if response is not None:
+            self.served['async'] += 1
+            status, headers, chunks = response
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+            return
+        self.served['threaded'] += 1
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._run_threaded, environ, send, loop)
+
+    def _match(self, environ):
+        try:
+            fn, view_args = self.routes.bind_to_environ(environ).match()
+        except HTTPException:
+            return None
+        try:
+            return fn(Request(dict(environ)).args, **view_args)
+        except ValueError:
+            return 'invalid'
+
+    def _cached(self, table, key):
+        # Bumps published by other worker processes first, as the Flask
+        # app's before_request hooks would, so peek() is not fooled by them
+        self.cache.refresh()
+        snapshot = self.app.extensions.get('catalog_snapshot')
+        if snapshot is not None:
+            snapshot.refresh()
+            if snapshot.has(table, key):
+                return True
+        return self.cache.peek(table, key)[0]
+
+    async def _prefetch(self, environ):
+        """Once the view can run inline without touching the database, the
+        (table, key) it serves ('invalid' for a 400); otherwise None."""
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return None
+        spec = self._match(environ)
+        if spec is None:
+            return None
+        if spec == 'invalid':
+            return spec
+        table, key, load = spec
+        if not self._cached(table, key):
+            rev = self.cache.revision(table)
+            flight = self._inflight.get((table, key, rev))
+            if flight is None:
+                flight = self._inflight[(table, key, rev)] = asyncio.ensure_future(
+                    self._load(environ, table, key, rev, load))
+                flight.add_done_callback(lambda f: self._inflight.pop((table, key, rev), None))
+            try:
+                await asyncio.shield(flight)
+            except Exception:
+                log.exception('async load of %s %r failed; serving it from a thread', table, key)
+                return None
+        # A write may have bumped the table meanwhile; then let a thread reload it
+        return (table, key) if self.cache.peek(table, key)[0] else None
+
+    async def _load(self, environ, table, key, rev, load):
+        async with self.sessions() as session:
+            build = await load(session)
+        with self.app.request_context(dict(environ)):
+            self.cache.put(table, key, rev, CachedBody.from_payload(build()))
+
+    def _run_inline(self, environ, ready):
+        """The view's (status, headers, chunks), run on the event loop; None
+        if its entry went away since _prefetch(), to be served from a thread."""
+        if ready != 'invalid' and not self._cached(*ready):
+            return None
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured['status'], captured['headers'] = status, headers
+
+        iterable = self.app(environ, start_response)
+        try:
+            chunks = list(iterable)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        return self._status(captured['status']), self._headers(captured['headers']), chunks
+
+    def _run_threaded(self, environ, send, loop):
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured['status'], captured['headers'] = status, headers
+
+        iterable = self.app(environ, start_response)
+        try:
+            started = False
+            for chunk in iterable:
+                if not started:
+                    emit({'type': 'http.response.start', 'status': self._status(captured['status']),
+                          'headers': self._headers(captured['headers'])})
+                    started = True
+                if chunk:
+                    emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                emit({'type': 'http.response.start', 'status': self._status(captured['status']),
+                      'headers': self._headers(captured['headers'])})
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    @staticmethod
+    def _status(status):
+        return int(status.split(' ', 1)[0])
+
+    @staticmethod
+    def _headers(headers):
+        # The ASGI server sends its own Date header
+        return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+                if name.lower() != 'date']
+
+    def stats(self):
+        return {'served': dict(self.served), 'loading': len(self._inflight), 'pool': pool_stats(self.engine)}
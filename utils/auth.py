@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import check_password_hash, generate_password_hash
+from .metrics import Timer
+
+
+class Busy(Exception):
+    """Raised when the password pool is saturated; retry later."""
+
+
+class PasswordHasher:
+    """Verifies passwords on a small dedicated thread pool.
+
+    scrypt/pbkdf2 release the GIL, so verification runs truly in parallel;
+    bounding it to LOGIN_HASH_WORKERS threads plus LOGIN_HASH_QUEUE waiting
+    attempts caps the CPU a login burst can take from the request threads.
+    Past that, verify() raises Busy at once instead of queueing.
+
+    A successful check also reports whether the stored hash was made with
+    another method or cost than PASSWORD_HASH_METHOD, and if so returns a
+    fresh hash for the caller to store.
+    """
+
+    def __init__(self, app=None):
+        self.timer = Timer()
+        self.rejected = 0
+        self._pid = None
+        self._lock = threading.Lock()
+        self._current = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOGIN_HASH_WORKERS', 2)
+        app.config.setdefault('LOGIN_HASH_QUEUE', 8)
+        app.config.setdefault('LOGIN_HASH_TIMEOUT', 5)
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        self.workers = app.config['LOGIN_HASH_WORKERS']
+        self.capacity = self.workers + app.config['LOGIN_HASH_QUEUE']
+        self.timeout = app.config['LOGIN_HASH_TIMEOUT']
+        self.method = app.config['PASSWORD_HASH_METHOD']
+
+    def _pool(self):
+        # Threads don't survive fork; each worker process builds its own pool
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password')
+                    self._slots = threading.BoundedSemaphore(self.capacity)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def current_prefix(self):
+        """Method and cost part ('scrypt:32768:8:1') of hashes made today."""
+        if self._current is None:
+            self._current = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._current
+
+    def _check(self, pwhash, password):
+        with self.timer.time():
+            if not check_password_hash(pwhash, password):
+                return False, None
+            if pwhash.split('$', 1)[0] != self.current_prefix():
+                return True, generate_password_hash(password, self.method)
+            return True, None
+
+    def verify(self, pwhash, password):
+        """Returns (ok, new_hash or None). Raises Busy when saturated."""
+        executor = self._pool()
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise Busy()
+        try:
+            future = executor.submit(self._check, pwhash, password or '')
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the hash is done, even if this request gave up waiting
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise Busy()
+
+    def stats(self):
+        stats = {'workers': self.workers, 'capacity': self.capacity, 'rejected': self.rejected}
+        stats['verify'] = self.timer.stats()
+        return stats
+
+
+class LoginThrottle:
+    """Failed-login counters per client IP and per username, in memory.
+
+    A key is blocked once it has `limit` failures within `window` seconds
+    and stays blocked until the oldest of them ages out. A successful login
+    clears the username. Per process, so with N workers a client gets up
+    to N times the limit; it is a brake on bursts, not an account lockout.
+    """
+
+    def __init__(self, app=None, max_keys=10000):
+        self.max_keys = max_keys
+        self._failures = {}
+        self._lock = threading.Lock()
+        self.blocked = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOGIN_ATTEMPT_WINDOW', 300)
+        app.config.setdefault('LOGIN_MAX_ATTEMPTS_USER', 5)
+        app.config.setdefault('LOGIN_MAX_ATTEMPTS_IP', 20)
+        self.window = app.config['LOGIN_ATTEMPT_WINDOW']
+        self.limits = {'user': app.config['LOGIN_MAX_ATTEMPTS_USER'], 'ip': app.config['LOGIN_MAX_ATTEMPTS_IP']}
+
+    def _keys(self, ip, username):
+        return [('ip', ip), ('user', (username or '').lower())]
+
+    def retry_after(self, ip, username):
+        """Seconds until this IP/username may try again; 0 if allowed now."""
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key in self._keys(ip, username):
+                failures = self._failures.get(key)
+                if not failures:
+                    continue
+                while failures and failures[0] <= now - self.window:
+                    failures.popleft()
+                if len(failures) >= self.limits[key[0]]:
+                    wait = max(wait, failures[0] + self.window - now)
+        if wait:
+            self.blocked += 1
+        return int(wait) + 1 if wait else 0
+
+    def failed(self, ip, username):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) >= self.max_keys:
+                # Forget keys with nothing left in the window, then the oldest
+                for key in [k for k, f in self._failures.items() if not f or f[-1] <= now - self.window]:
+                    del self._failures[key]
+                while len(self._failures) >= self.max_keys:
+                    del self._failures[next(iter(self._failures))]
+            for key in self._keys(ip, username):
+                self._failures.setdefault(key, deque(maxlen=self.limits[key[0]])).append(now)
+
+    def succeeded(self, ip, username):
+        with self._lock:
+            self._failures.pop(('user', (username or '').lower()), None)
+
+    def stats(self):
+        return {'tracked_keys': len(self._failures), 'blocked': self.blocked, 'window': self.window}
@@ -0,0 +1,202 @@
+import threading
+import time
+from bisect import bisect_right, insort
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from .bookings import booking_added, interval, parse_time
+
+# Monday=0 .. Sunday=6 -> (open, close); None means closed
+DEFAULT_WORKING_HOURS = {0: ('09:00', '19:00'), 1: ('09:00', '19:00'), 2: ('09:00', '19:00'),
+                         3: ('09:00', '19:00'), 4: ('09:00', '19:00'), 5: ('09:00', '19:00'), 6: None}
+
+def format_time(minutes):
+    return '%02d:%02d' % divmod(minutes, 60)
+
+
+class AvailabilityIndex:
+    """Busy intervals per (stylist_id, date), kept in memory.
+
+    Each day holds the raw (start, end) minutes of its bookings, loaded from
+    the bookings table on first use and then updated in place as bookings
+    are committed (see watch_bookings), plus a merged, non-overlapping copy
+    that slot lookups bisect. Entries expire after `ttl` seconds to pick up
+    bookings written by other worker processes; past days and stale entries
+    are dropped once more than `max_entries` days are held.
+    """
+
+    def __init__(self, db, Booking, ttl=60, max_entries=10000):
+        self.db = db
+        self.Booking = Booking
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._days = {}  # (stylist_id, date) -> [loaded_at, raw intervals, merged or None]
+        self._lock = threading.Lock()
+
+    def load(self, stylist_ids, days):
+        """Load every (stylist, day) pair that is missing or stale with one query.
+        Returns {(stylist_id, day): entry} for all the pairs asked for."""
+        now = time.monotonic()
+        with self._lock:
+            entries = {(s, d): self._days.get((s, d)) for s in stylist_ids for d in days}
+        missing = [key for key, entry in entries.items() if entry is None or now - entry[0] >= self.ttl]
+        if not missing:
+            return entries
+        busy = {key: [] for key in missing}
+        Booking = self.Booking
+        days = sorted({d for _, d in missing})
+        # Served by the (stylist_id, start_at) index
+        rows = (self.db.session.query(Booking.stylist_id, Booking.start_at, Booking.end_at)
+                .filter(Booking.stylist_id.in_({s for s, _ in missing}),
+                        Booking.start_at >= datetime.fromisoformat(days[0]),
+                        Booking.start_at < datetime.fromisoformat(days[-1]) + timedelta(days=1),
+                        Booking.end_at.isnot(None))
+                .all())
+        for stylist_id, start_at, end_at in rows:
+            key = (stylist_id, start_at.date().isoformat())
+            if key in busy:
+                busy[key].append(interval(start_at, end_at))
+        with self._lock:
+            for key, intervals in busy.items():
+                entries[key] = self._days[key] = [now, sorted(intervals), None]
+            if len(self._days) > self.max_entries:
+                self._prune(now)
+        return entries
+
+    def _prune(self, now):
+        # Called with the lock held. Past days are not asked for again and stale
+        # entries would be reloaded anyway; if that is not enough, the oldest loads go
+        today = date.today().isoformat()
+        for key in [k for k, e in self._days.items() if k[1] < today or now - e[0] >= self.ttl]:
+            del self._days[key]
+        excess = len(self._days) - self.max_entries
+        if excess > 0:
+            for key in sorted(self._days, key=lambda k: self._days[k][0])[:excess]:
+                del self._days[key]
+
+    def add(self, stylist_id, day, start, end):
+        with self._lock:
+            entry = self._days.get((stylist_id, day))
+            if entry is not None:
+                insort(entry[1], (start, end))
+                entry[2] = None
+
+    def drop(self, stylist_id, day):
+        with self._lock:
+            self._days.pop((stylist_id, day), None)
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+
+    def busy(self, stylist_id, day):
+        """Merged busy intervals for the day, sorted and non-overlapping."""
+        # The entry itself, not a later lookup: clear() or _prune() may run in between
+        entry = self.load([stylist_id], [day])[(stylist_id, day)]
+        with self._lock:
+            if entry[2] is None:
+                merged = []
+                for start, end in entry[1]:
+                    if merged and start <= merged[-1][1]:
+                        merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                    else:
+                        merged.append((start, end))
+                entry[2] = merged
+            return entry[2]
+
+    def free_slots(self, stylist_id, day, duration, hours, step, not_before=0):
+        """Start times (minutes) within opening hours where `duration` fits."""
+        if hours is None:
+            return []
+        intervals = self.busy(stylist_id, day)
+        opens, closes = parse_time(hours[0]), parse_time(hours[1])
+        slots = []
+        start = max(opens, -(-not_before // step) * step)
+        while start + duration <= closes:
+            # Intervals are disjoint and sorted, so only the neighbours of `start` can overlap
+            i = bisect_right(intervals, (start, float('inf')))
+            if (i == 0 or intervals[i - 1][1] <= start) and (i == len(intervals) or intervals[i][0] >= start + duration):
+                slots.append(start)
+            start += step
+        return slots
+
+
+def watch_bookings(db, index, Booking, Service):
+    """Apply committed booking inserts/deletes to the index incrementally.
+    A change to any service may change durations, so it resets the index."""
+
+    @event.listens_for(db.session, 'after_flush')
+    def _collect(session, flush_context):
+        changes = session.info.setdefault('availability_changes', [])
+        for obj in session.new:
+            if isinstance(obj, Booking):
+                booking_added(session, obj.stylist_id, obj.start_at, obj.end_at)
+        for obj in session.deleted:
+            if isinstance(obj, Booking) and obj.start_at is not None:
+                changes.append(('drop', obj.stylist_id, obj.start_at.date().isoformat()))
+        for obj in session.dirty:
+            if isinstance(obj, (Booking, Service)):
+                changes.append(('reset',))
+
+    @event.listens_for(db.session, 'after_commit')
+    def _apply(session):
+        changes = session.info.pop('availability_changes', None)
+        if changes:
+            apply_changes(index, changes)
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _discard(session):
+        session.info.pop('availability_changes', None)
+
+
+def apply_changes(index, changes):
+    if any(c[0] == 'reset' for c in changes):
+        index.clear()
+        return
+    for change in changes:
+        if change[0] == 'drop':
+            index.drop(change[1], change[2])
+        else:
+            index.add(*change[1:])
+
+
+def parse_availability_args(args, max_days):
+    """Returns (service_id, stylist_id or None, first day, number of days)."""
+    try:
+        service_id = int(args['serviceId'])
+        stylist_id = int(args['stylistId']) if args.get('stylistId') else None
+        first = date.fromisoformat(args['date']) if args.get('date') else date.today()
+        days = int(args.get('days', 1))
+    except KeyError:
+        raise ValueError('Missing field: serviceId')
+    except ValueError:
+        raise ValueError('serviceId/stylistId/days must be integers and date YYYY-MM-DD')
+    if not 1 <= days <= max_days:
+        raise ValueError('days must be between 1 and %d' % max_days)
+    return service_id, stylist_id, first, days
+
+
+def availability(index, stylist_ids, first, days, duration, config):
+    """Free slots per stylist for each day in [first, first + days).
+
+    Opening hours come from WORKING_HOURS (weekday -> (open, close) or None)
+    unless STYLIST_HOURS has an entry for the stylist; slots start every
+    AVAILABILITY_SLOT_MINUTES. Past days and past times today are skipped.
+    """
+    hours_by_weekday = config.get('WORKING_HOURS', DEFAULT_WORKING_HOURS)
+    stylist_hours = config.get('STYLIST_HOURS', {})
+    step = config.get('AVAILABILITY_SLOT_MINUTES', 15)
+    today, now = date.today(), datetime.now()
+    dates = [first + timedelta(days=i) for i in range(days)]
+    dates = [d for d in dates if d >= today]
+    index.load(stylist_ids, [d.isoformat() for d in dates])
+
+    result = []
+    for d in dates:
+        not_before = now.hour * 60 + now.minute if d == today else 0
+        stylists = []
+        for stylist_id in stylist_ids:
+            hours = stylist_hours.get(stylist_id, hours_by_weekday).get(d.weekday())
+            slots = index.free_slots(stylist_id, d.isoformat(), duration, hours, step, not_before)
+            stylists.append({'stylistId': stylist_id, 'slots': [format_time(m) for m in slots]})
+        result.append({'date': d.isoformat(), 'stylists': stylists})
+    return result
@@ -0,0 +1,169 @@
+import re
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, insert, inspect, select
+
+_TIME_RE = re.compile(r'^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$')
+
+
+def parse_time(value):
+    """Minutes since midnight for '14:30', '2:30 PM', '9 am'; None if unparseable."""
+    m = _TIME_RE.match(value or '')
+    if not m:
+        return None
+    hour, minute, ampm = int(m.group(1)), int(m.group(2) or 0), m.group(3)
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm.lower() == 'pm' else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def appointment_start(day, time_text):
+    """Combine the free-text date ('YYYY-MM-DD') and time columns into a
+    naive datetime in salon-local time; None if either doesn't parse."""
+    try:
+        d = date.fromisoformat((day or '').strip())
+    except ValueError:
+        return None
+    minutes = parse_time(time_text)
+    if minutes is None:
+        return None
+    return datetime(d.year, d.month, d.day) + timedelta(minutes=minutes)
+
+
+def interval(start_at, end_at):
+    """(start, end) in minutes from midnight of the start day."""
+    midnight = start_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ((start_at - midnight) // timedelta(minutes=1), (end_at - midnight) // timedelta(minutes=1))
+
+
+def booking_added(session, stylist_id, start_at, end_at):
+    """Queue a new booking for the index once `session` commits. Bulk
+    inserts that bypass the ORM unit of work call this themselves."""
+    if stylist_id is not None and start_at is not None and end_at is not None:
+        session.info.setdefault('availability_changes', []).append(
+            ('add', stylist_id, start_at.date().isoformat()) + interval(start_at, end_at))
+
+
+def watch_booking_times(Booking, Service):
+    """Derive Booking.start_at/end_at from date, time and the service
+    duration whenever a booking is inserted or those fields change."""
+
+    def derive(mapper, connection, target):
+        state = inspect(target)
+        if state.persistent and not any(state.attrs[name].history.has_changes()
+                                        for name in ('date', 'time', 'service_id')):
+            return
+        target.start_at = appointment_start(target.date, target.time)
+        target.end_at = None
+        if target.start_at is not None:
+            duration = connection.execute(
+                select(Service.duration).where(Service.id == target.service_id)).scalar()
+            if duration is not None:
+                target.end_at = target.start_at + timedelta(minutes=duration)
+
+    event.listen(Booking, 'before_insert', derive)
+    event.listen(Booking, 'before_update', derive)
+
+
+BATCH_MAX = 500
+BATCH_MODES = ('atomic', 'best_effort')
+REQUIRED_FIELDS = ('name', 'email', 'phone', 'serviceId', 'date', 'time')
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _validate(item, durations, stylist_ids):
+    if not isinstance(item, dict):
+        return ['Item must be an object'], None
+    errors = ['Missing field: %s' % f for f in REQUIRED_FIELDS if item.get(f) in (None, '')]
+    if errors:
+        return errors, None
+    if not _is_id(item['serviceId']):
+        errors.append('serviceId must be an integer')
+    elif item['serviceId'] not in durations:
+        errors.append('Unknown serviceId: %s' % item['serviceId'])
+    if item.get('stylistId') is not None and not _is_id(item['stylistId']):
+        errors.append('stylistId must be an integer')
+    elif item.get('stylistId') is not None and item['stylistId'] not in stylist_ids:
+        errors.append('Unknown stylistId: %s' % item['stylistId'])
+    start = appointment_start(str(item['date']), str(item['time']))
+    if start is None:
+        errors.append('date/time must look like YYYY-MM-DD and HH:MM')
+    if errors:
+        return errors, None
+    return [], {
+        'name': item['name'], 'email': item['email'], 'phone': item['phone'],
+        'service_id': item['serviceId'], 'stylist_id': item.get('stylistId'),
+        'date': item['date'], 'time': item['time'], 'message': item.get('message'),
+        'start_at': start, 'end_at': start + timedelta(minutes=durations[item['serviceId']]),
+    }
+
+
+def create_bookings(db, Booking, Service, Stylist, items, mode):
+    """Validate and insert a batch of bookings in one transaction.
+
+    Services and stylists for the whole batch are checked with one query
+    each, and valid rows go in with a single executemany INSERT and one
+    commit. In 'atomic' mode any invalid item rejects the whole batch; in
+    'best_effort' the valid items are inserted and the rest reported.
+    Returns (status_code, payload) with a result per item, in input order.
+    """
+    if mode not in BATCH_MODES:
+        return 400, {'message': 'mode must be one of: %s' % ', '.join(BATCH_MODES)}
+    if not isinstance(items, list) or not items:
+        return 400, {'message': 'Expected a non-empty list of bookings'}
+    if len(items) > BATCH_MAX:
+        return 400, {'message': 'At most %d bookings per batch' % BATCH_MAX}
+
+    wanted = lambda key: {i.get(key) for i in items if isinstance(i, dict) and _is_id(i.get(key))}
+    durations = dict(db.session.query(Service.id, Service.duration).filter(Service.id.in_(wanted('serviceId'))))
+    stylist_ids = {i for (i,) in db.session.query(Stylist.id).filter(Stylist.id.in_(wanted('stylistId')))}
+
+    results, rows = [], []
+    for index, item in enumerate(items):
+        errors, row = _validate(item, durations, stylist_ids)
+        if errors:
+            results.append({'index': index, 'status': 'error', 'errors': errors})
+        else:
+            results.append({'index': index, 'status': 'confirmed'})
+            rows.append((index, row))
+
+    if mode == 'atomic' and len(rows) < len(items):
+        for result in results:
+            if result['status'] == 'confirmed':
+                result['status'] = 'rejected'
+        return 422, {'mode': mode, 'created': 0, 'results': results}
+    if not rows:
+        return 422, {'mode': mode, 'created': 0, 'results': results}
+
+    try:
+        ids = _bulk_insert(db, Booking, [row for _, row in rows])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return 400, {'message': str(e)}
+    for (index, _), id in zip(rows, ids):
+        results[index]['id'] = id
+    return 201, {'mode': mode, 'created': len(rows), 'results': results}
+
+
+def _bulk_insert(db, Booking, rows):
+    """INSERT all rows in one executemany and return their ids in order."""
+    dialect = db.session.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        stmt = insert(Booking).returning(Booking.id, sort_by_parameter_order=True)
+        ids = list(db.session.scalars(stmt, rows))
+        # Core inserts skip the flush events, so tell the availability index directly
+        for row in rows:
+            booking_added(db.session, row['stylist_id'], row['start_at'], row['end_at'])
+        return ids
+    # No RETURNING with executemany (e.g. MySQL): let the ORM batch the inserts
+    bookings = [Booking(**row) for row in rows]
+    db.session.add_all(bookings)
+    db.session.flush()
+    return [b.id for b in bookings]
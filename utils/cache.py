@@ -0,0 +1,293 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: no writer lock; os.replace() still switches atomically
+    fcntl = None
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CatalogCache:
+    """In-process cache for catalog reads (services, stylists, ...).
+
+    Every table has a revision counter. Entries remember the revision they
+    were loaded at and are ignored once the table is bumped, so a write never
+    has to hunt down individual keys. Concurrent misses on the same key are
+    collapsed into one loader call (single-flight). A loader returning None
+    is cached too, which gives negative caching for unknown ids.
+
+    The cache lives in one process; see watch_models() for invalidation.
+    With share() the bumps also reach the other worker processes on the
+    host through a small revision file, checked by refresh().
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._revisions = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._shared = None
+        self._shared_lock = threading.Lock()
+        self._seen = (None, {})  # identity of the revision file last read, and its counters
+
+    def revision(self, table):
+        return self._revisions.get(table, 0)
+
+    def bump(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._revisions[table] = self._revisions.get(table, 0) + 1
+            for key in [k for k in self._entries if k[0] in tables]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # --- revisions shared between processes ---
+
+    def share(self, path):
+        """Exchange table bumps with the other processes using `path`."""
+        self._shared = path
+        self._seen = self._read_shared()
+
+    def _read_shared(self):
+        try:
+            with open(self._shared) as f:
+                stat = os.fstat(f.fileno())
+                return (stat.st_ino, stat.st_mtime_ns), json.load(f)
+        except (OSError, ValueError):
+            return None, {}
+
+    def publish(self, *tables):
+        """Bump `tables` here and, when shared, in every other process."""
+        self.bump(*tables)
+        if self._shared is None:
+            return
+        os.makedirs(os.path.dirname(self._shared) or '.', exist_ok=True)
+        with open(self._shared + '.lock', 'a') as lock, self._shared_lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            counters = self._read_shared()[1]
+            # Bumps published elsewhere since our last look must not be skipped
+            elsewhere = [t for t, rev in counters.items() if self._seen[1].get(t) != rev and t not in tables]
+            for table in tables:
+                counters[table] = counters.get(table, 0) + 1
+            tmp = '%s.%d.tmp' % (self._shared, os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump(counters, f)
+            os.replace(tmp, self._shared)
+            stat = os.stat(self._shared)  # nobody else writes while we hold the lock
+            self._seen = (stat.st_ino, stat.st_mtime_ns), counters
+        if elsewhere:
+            self.bump(*elsewhere)
+
+    def refresh(self):
+        """Drop tables another process bumped since the last check (one stat())."""
+        if self._shared is None:
+            return
+        try:
+            stat = os.stat(self._shared)
+        except OSError:
+            return
+        if self._seen[0] == (stat.st_ino, stat.st_mtime_ns):
+            return
+        with self._shared_lock:
+            seen = self._seen[1]
+            self._seen = self._read_shared()
+            changed = [t for t, rev in self._seen[1].items() if seen.get(t) != rev]
+        if changed:
+            self.bump(*changed)
+
+    def get_or_load(self, table, key, loader):
+        while True:
+            with self._lock:
+                rev = self._revisions.get(table, 0)
+                entry = self._entries.get((table, key))
+                if entry is not None and entry[0] == rev:
+                    self._entries.move_to_end((table, key))
+                    self.hits += 1
+                    return entry[1]
+                flight_key = (table, key, rev)
+                flight = self._inflight.get(flight_key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[flight_key] = _Flight()
+                    self.misses += 1
+
+            if not leader:
+                flight.event.wait()
+                if flight.error is None:
+                    return flight.value
+                continue  # the leader failed, try again ourselves
+
+            try:
+                flight.value = loader()
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[flight_key]
+                    if flight.error is None:
+                        self._store(table, key, rev, flight.value)
+                flight.event.set()
+            return flight.value
+
+    def _store(self, table, key, rev, value):
+        if self._revisions.get(table, 0) == rev:
+            self._entries[(table, key)] = (rev, value)
+            self._entries.move_to_end((table, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def peek(self, table, key):
+        """(True, value) if a current entry exists, else (False, None). Never loads."""
+        with self._lock:
+            entry = self._entries.get((table, key))
+            if entry is not None and entry[0] == self._revisions.get(table, 0):
+                return True, entry[1]
+        return False, None
+
+    def put(self, table, key, rev, value):
+        """Store a value loaded outside get_or_load() (the async API) as of
+        revision `rev`; dropped if the table was bumped in the meantime."""
+        with self._lock:
+            self.misses += 1
+            self._store(table, key, rev, value)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'revisions': dict(self._revisions)}
+
+
+def share_catalog(app, cache):
+    """Keep the CatalogCache of every worker process in step: commits are
+    published to CATALOG_REVISIONS_PATH and each request first picks up the
+    bumps made elsewhere. '' keeps invalidation within the process."""
+    if app.config.get('CATALOG_REVISIONS_PATH') is None:
+        app.config['CATALOG_REVISIONS_PATH'] = os.path.join(app.instance_path, 'catalog.revisions')
+    if app.config['CATALOG_REVISIONS_PATH']:
+        cache.share(app.config['CATALOG_REVISIONS_PATH'])
+        app.before_request(cache.refresh)
+
+
+def watch_models(db, cache, *models):
+    """Bump the cache revision of each model's table after a commit that
+    inserted, updated or deleted rows of that model."""
+    tables = {m: m.__tablename__ for m in models}
+
+    @event.listens_for(db.session, 'after_flush')
+    def _collect(session, flush_context):
+        touched = session.info.setdefault('catalog_touched', set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            table = tables.get(type(obj))
+            if table:
+                touched.add(table)
+
+    @event.listens_for(db.session, 'after_commit')
+    def _bump(session):
+        touched = session.info.pop('catalog_touched', None)
+        if touched:
+            cache.publish(*touched)
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _discard(session):
+        session.info.pop('catalog_touched', None)
+
+
+class TTLCache:
+    """Small LRU cache whose entries also expire after `ttl` seconds.
+
+    Used for identities (the Flask-Login user loader): entries are dropped
+    by key when the row changes in this process (see watch_identities), and
+    the TTL bounds how long a change made by another process can go unseen.
+    """
+
+    def __init__(self, max_entries=256, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            # Don't store a value that an invalidation raced with
+            if self._generation == generation:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+def load_detached(db, model, id):
+    """Load a row and detach it from the session, so it can be cached and
+    shared across requests without being expired by later commits."""
+    obj = db.session.get(model, id)
+    if obj is not None:
+        db.session.expunge(obj)
+    return obj
+
+
+def watch_identities(db, cache, model):
+    """Drop cached rows of `model` (keyed by primary key) after a commit
+    that updated or deleted them."""
+
+    @event.listens_for(db.session, 'after_flush')
+    def _collect(session, flush_context):
+        changed = session.info.setdefault('identities_changed', set())
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, model):
+                changed.add(obj.id)
+
+    @event.listens_for(db.session, 'after_commit')
+    def _invalidate(session):
+        changed = session.info.pop('identities_changed', None)
+        if changed:
+            cache.invalidate(*changed)
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _discard(session):
+        session.info.pop('identities_changed', None)
@@ -0,0 +1,75 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'text/')
+
+
+def compress_bytes(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def choose_encoding(app, size):
+    """Pick the best encoding the client accepts, or None to send identity."""
+    if not app.config['COMPRESS_ENABLED'] or size < app.config['COMPRESS_MIN_SIZE']:
+        return None
+    if request.method not in app.config['COMPRESS_METHODS']:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def encoded_etag(etag, encoding):
+    # A strong ETag must differ between representations of the same resource
+    return '%s-%s' % (etag, encoding) if encoding else etag
+
+
+class Compress:
+    """Negotiates Accept-Encoding for responses that were not already
+    encoded upstream (cached catalog bodies carry precompressed variants,
+    see CachedBody). Only methods in COMPRESS_METHODS are compressed, so
+    dynamic POST responses go out as-is by default."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_METHODS', ('GET', 'HEAD'))
+        # On-the-fly levels favour speed; precompressed cached bodies are
+        # encoded once per revision, so they use the strongest settings.
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_QUALITY', 4)
+        app.config.setdefault('COMPRESS_CACHED_GZIP_LEVEL', 9)
+        app.config.setdefault('COMPRESS_CACHED_BR_QUALITY', 11)
+
+        @app.after_request
+        def _compress(response):
+            if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                    or 'Content-Encoding' in response.headers
+                    or not response.mimetype.startswith(COMPRESSIBLE_TYPES)):
+                return response
+            data = response.get_data()
+            encoding = choose_encoding(app, len(data))
+            response.vary.add('Accept-Encoding')
+            if encoding is None:
+                return response
+            level = app.config['COMPRESS_BR_QUALITY' if encoding == 'br' else 'COMPRESS_GZIP_LEVEL']
+            response.set_data(compress_bytes(data, encoding, level))
+            response.headers['Content-Encoding'] = encoding
+            etag, weak = response.get_etag()
+            if etag:
+                response.set_etag(encoded_etag(etag, encoding), weak)
+            return response
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+BOOKING_EXPORT_COLUMNS = ('id', 'name', 'email', 'phone', 'service_id', 'stylist_id', 'date', 'time',
+                          'start_at', 'end_at', 'message', 'created_at')
+MESSAGE_EXPORT_COLUMNS = ('id', 'name', 'email', 'subject', 'message', 'is_read', 'created_at')
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+YIELD_PER = 1000
+
+
+def _value(v):
+    return v.isoformat() if isinstance(v, (date, datetime)) else v
+
+
+def _csv_chunks(header, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for rows in partitions:
+        writer.writerows([[_value(v) for v in row] for row in rows])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(header, partitions):
+    for rows in partitions:
+        yield ''.join(json.dumps(dict(zip(header, map(_value, row))), separators=(',', ':')) + '\n'
+                      for row in rows)
+
+
+def export_response(db, model, allowed, date_column, args, name):
+    """Stream the rows of `model` as CSV or NDJSON.
+
+    Query args: format (csv|ndjson), columns (comma separated subset of
+    `allowed`), date_from/date_to (YYYY-MM-DD, inclusive, on `date_column`).
+    Only the chosen columns are selected, and rows are fetched YIELD_PER at a
+    time with a streaming cursor, then written out chunk by chunk, so memory
+    stays flat however many rows match. Raises ValueError on bad arguments.
+    """
+    fmt = args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError('format must be csv or ndjson')
+    columns = [c.strip() for c in args.get('columns', '').split(',') if c.strip()] or list(allowed)
+    unknown = [c for c in columns if c not in allowed]
+    if unknown:
+        raise ValueError('Unknown column(s): %s' % ', '.join(unknown))
+
+    stmt = select(*[getattr(model, c) for c in columns]).order_by(model.id)
+    column = getattr(model, date_column)
+    try:
+        if args.get('date_from'):
+            stmt = stmt.where(column >= datetime.combine(date.fromisoformat(args['date_from']), time.min))
+        if args.get('date_to'):
+            stmt = stmt.where(column < datetime.combine(date.fromisoformat(args['date_to']), time.min) + timedelta(days=1))
+    except ValueError:
+        raise ValueError('date_from/date_to must be YYYY-MM-DD dates')
+
+    def generate():
+        result = db.session.execute(stmt.execution_options(yield_per=YIELD_PER))
+        chunks = _csv_chunks if fmt == 'csv' else _ndjson_chunks
+        try:
+            yield from chunks(columns, result.partitions())
+        finally:
+            result.close()
+
+    filename = '%s-%s.%s' % (name, date.today().isoformat(), fmt)
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': 'attachment; filename=%s' % filename})
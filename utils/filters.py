@@ -0,0 +1,211 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import String, literal, select
+from sqlalchemy.orm import joinedload
+from .pagination import decode_cursor, keyset_page, keyset_query, order_by, split_page
+from .serializers import SERVICE
+
+SERVICE_SORTS = ('id', 'price', '-price', 'duration', '-duration', 'title')
+# Python type of each sort column, for the values carried in a cursor
+SERVICE_SORT_TYPES = {'id': int, 'price': int, 'duration': int, 'title': str}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+BOOKINGS_PAGE_SIZE = 50
+MESSAGES_PAGE_SIZE = 50
+
+
+def _int_arg(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('%s must be an integer' % name)
+
+
+def parse_service_filters(args):
+    """Validate the /api/services query string.
+
+    Returns a tuple of (name, value) pairs with defaults dropped, usable
+    both as a cache key and as input to service_page(); ?fields= becomes
+    ('fields', keys of SERVICE). Raises ValueError with a client-facing
+    message on bad input.
+    """
+    filters = {}
+    if args.get('category'):
+        filters['category'] = args['category']
+    featured = args.get('featured')
+    if featured not in (None, ''):
+        if featured.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError('featured must be true or false')
+        filters['featured'] = featured.lower() in ('true', '1')
+    for name in ('min_price', 'max_price', 'max_duration'):
+        value = _int_arg(args, name)
+        if value is not None:
+            filters[name] = value
+    sort = args.get('sort') or 'id'
+    if sort not in SERVICE_SORTS:
+        raise ValueError('sort must be one of: %s' % ', '.join(SERVICE_SORTS))
+    if sort != 'id':
+        filters['sort'] = sort
+    limit = _int_arg(args, 'limit')
+    if limit is not None or args.get('cursor'):
+        # Clamped like an oversized limit; only a missing one means the default
+        filters['limit'] = DEFAULT_PAGE_SIZE if limit is None else min(max(limit, 1), MAX_PAGE_SIZE)
+    if args.get('cursor'):
+        column = sort.lstrip('-')
+        types = [int] if column == 'id' else [SERVICE_SORT_TYPES[column], int]
+        values = decode_cursor(args['cursor'], len(types))
+        # A forged cursor must not reach the query with lists, nulls or booleans in it
+        if not all(type(v) is t for t, v in zip(types, values)):
+            raise ValueError('Invalid cursor')
+        filters['cursor'] = args['cursor']
+    fields = SERVICE.parse_fields(args.get('fields'))
+    if fields:
+        filters['fields'] = fields
+    return tuple(sorted(filters.items()))
+
+
+def filter_services(query, Service, filters):
+    """Apply the filters to `query` (Service.query or select(Service)).
+    Returns (query, ordering); ordering ends in Service.id."""
+    f = dict(filters)
+    if 'category' in f:
+        query = query.filter(Service.category == f['category'])
+    if 'featured' in f:
+        query = query.filter(Service.is_featured == f['featured'])
+    if 'min_price' in f:
+        query = query.filter(Service.price >= f['min_price'])
+    if 'max_price' in f:
+        query = query.filter(Service.price <= f['max_price'])
+    if 'max_duration' in f:
+        query = query.filter(Service.duration <= f['max_duration'])
+
+    sort = f.get('sort', 'id')
+    desc = sort.startswith('-')
+    ordering = [(Service.id, desc)]
+    if sort.lstrip('-') != 'id':
+        ordering.insert(0, (getattr(Service, sort.lstrip('-')), desc))
+    return query, ordering
+
+
+def _sparse(query, Service, filters, ordering):
+    # ?fields= on the ORM path. The sort columns are loaded too, since the
+    # next cursor is read from the last row
+    f = dict(filters)
+    if 'fields' not in f:
+        return query
+    return query.options(SERVICE.load_only(Service, f['fields'], *[c for c, _ in ordering]))
+
+
+def _cursor_key(ordering):
+    return lambda row: [getattr(row, c.key) for c, _ in ordering]
+
+
+def service_page(Service, filters):
+    """Run the filtered /api/services query.
+
+    Without `limit`/`cursor` every matching row is returned, as before.
+    Otherwise pages are keyset based on (sort column, id), which the
+    (category, price, id) and (is_featured, id) indexes on Service serve.
+    Returns (services, next_cursor).
+    """
+    f = dict(filters)
+    query, ordering = filter_services(Service.query, Service, filters)
+    query = _sparse(query, Service, filters, ordering)
+    if 'limit' not in f:
+        return query.order_by(*order_by(ordering)).all(), None
+    return keyset_page(query, ordering, f.get('cursor'), f['limit'], _cursor_key(ordering))
+
+
+async def service_page_async(session, Service, filters):
+    """service_page() on an AsyncSession, for the ASGI API."""
+    f = dict(filters)
+    query, ordering = filter_services(select(Service), Service, filters)
+    query = _sparse(query, Service, filters, ordering)
+    if 'limit' not in f:
+        return (await session.scalars(query.order_by(*order_by(ordering)))).all(), None
+    rows = (await session.scalars(keyset_query(query, ordering, f.get('cursor'), f['limit']))).all()
+    return split_page(rows, f['limit'], _cursor_key(ordering))
+
+
+def service_select(Service, filters):
+    """The service_page() query as a Core select of plain columns: those of
+    SERVICE (or ?fields=) in serializer order, then any sort column not
+    among them. Returns (statement, ordering)."""
+    f = dict(filters)
+    columns = SERVICE.columns(Service, f.get('fields'))
+    query, ordering = filter_services(select(*columns), Service, filters)
+    selected = {c.key for c in columns}
+    query = query.add_columns(*[c for c, _ in ordering if c.key not in selected])
+    if 'limit' not in f:
+        return query.order_by(*order_by(ordering)), ordering
+    return keyset_query(query, ordering, f.get('cursor'), f['limit']), ordering
+
+
+def service_rows(session, Service, filters):
+    """service_page() without the ORM: (rows, next_cursor) with rows as
+    tuples for SERVICE.row_serializer(). No Service instances are built or
+    tracked in the identity map."""
+    query, ordering = service_select(Service, filters)
+    rows = session.execute(query).all()
+    f = dict(filters)
+    return split_page(rows, f['limit'], _cursor_key(ordering)) if 'limit' in f else (rows, None)
+
+
+async def service_rows_async(session, Service, filters):
+    """service_rows() on an AsyncSession."""
+    query, ordering = service_select(Service, filters)
+    rows = (await session.execute(query)).all()
+    f = dict(filters)
+    return split_page(rows, f['limit'], _cursor_key(ordering)) if 'limit' in f else (rows, None)
+
+
+def parse_booking_filters(args):
+    """Validate the admin bookings list filters (date_from, date_to,
+    stylist_id, service_id). Returns a dict of the ones that are set."""
+    filters = {}
+    for name in ('date_from', 'date_to'):
+        if args.get(name):
+            try:
+                filters[name] = date.fromisoformat(args[name]).isoformat()
+            except ValueError:
+                raise ValueError('%s must be a YYYY-MM-DD date' % name)
+    for name in ('stylist_id', 'service_id'):
+        value = _int_arg(args, name)
+        if value is not None:
+            filters[name] = value
+    return filters
+
+
+def _timestamp_text(value):
+    # Compare against the timestamp text as it was read rather than a datetime
+    # bind: SQLite stores server-default timestamps without microseconds, and a
+    # datetime parameter would be rendered with them and never compare equal.
+    datetime.fromisoformat(value)
+    return literal(value, String)
+
+
+def booking_page(Booking, filters, cursor=None, limit=BOOKINGS_PAGE_SIZE):
+    """One page of bookings, newest first, keyset-paginated on
+    (created_at, id). Service and stylist are joined in the same query so
+    rendering the page does not issue a query per row."""
+    query = Booking.query.options(joinedload(Booking.service), joinedload(Booking.stylist))
+    if 'date_from' in filters:
+        query = query.filter(Booking.start_at >= datetime.fromisoformat(filters['date_from']))
+    if 'date_to' in filters:
+        query = query.filter(Booking.start_at < datetime.fromisoformat(filters['date_to']) + timedelta(days=1))
+    if 'stylist_id' in filters:
+        query = query.filter(Booking.stylist_id == filters['stylist_id'])
+    if 'service_id' in filters:
+        query = query.filter(Booking.service_id == filters['service_id'])
+    ordering = [(Booking.created_at, True), (Booking.id, True)]
+    return keyset_page(query, ordering, cursor, limit, lambda b: [b.created_at, b.id],
+                       types=[_timestamp_text, int])
+
+
+def message_page(Message, cursor=None, limit=MESSAGES_PAGE_SIZE):
+    """One page of the inbox, newest first, keyset-paginated on (created_at, id)."""
+    ordering = [(Message.created_at, True), (Message.id, True)]
+    return keyset_page(Message.query, ordering, cursor, limit, lambda m: [m.created_at, m.id],
+                       types=[_timestamp_text, int])
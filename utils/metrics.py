@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import deque
+
+
+class Timer:
+    """Latency of the last `window` observations, plus lifetime count/max."""
+
+    def __init__(self, window=1024):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.max = max(self.max, seconds)
+
+    def time(self):
+        return _Timing(self)
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, peak = self.count, self.max
+        if not samples:
+            return {'count': count}
+        pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 3)
+        return {'count': count, 'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99),
+                'max_ms': round(peak * 1000, 3)}
+
+
+class _Timing:
+    def __init__(self, timer):
+        self.timer = timer
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.observe(time.perf_counter() - self.started)
+
+
+class Metrics:
+    """Registry of named stats sources, read together by /admin/metrics.
+
+    A source is any callable returning a JSON-serializable dict (e.g.
+    CatalogCache.stats); it is only called when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self._sources = {}
+
+    def register(self, name, source):
+        self._sources[name] = source
+
+    def snapshot(self):
+        return {name: source() for name, source in sorted(self._sources.items())}
@@ -0,0 +1,115 @@
+import hashlib
+from datetime import timedelta
+from sqlalchemy import DateTime, bindparam, inspect, text
+from sqlalchemy.exc import DBAPIError
+from .bookings import appointment_start
+
+BATCH_SIZE = 1000
+
+
+def _add_columns(conn, table, columns):
+    existing = {c['name'] for c in inspect(conn).get_columns(table)}
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text('ALTER TABLE %s ADD COLUMN %s %s' % (table, name, ddl)))
+
+
+def booking_times(db, batch_size=BATCH_SIZE, log=print):
+    """Add bookings.start_at/end_at and backfill them from the free-text
+    date/time columns, one committed batch of rows at a time so the table
+    is never locked for the whole backfill. Rows whose date or time can't
+    be parsed keep NULL and are reported."""
+    with db.engine.begin() as conn:
+        _add_columns(conn, 'bookings', [('start_at', 'DATETIME'), ('end_at', 'DATETIME')])
+
+    last_id, filled, skipped = 0, 0, 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(text(
+                'SELECT b.id, b.date, b.time, s.duration FROM bookings b '
+                'LEFT JOIN services s ON s.id = b.service_id '
+                'WHERE b.id > :last AND b.start_at IS NULL ORDER BY b.id LIMIT :n'),
+                {'last': last_id, 'n': batch_size}).fetchall()
+            if not rows:
+                break
+            updates = []
+            for id, day, time, duration in rows:
+                start = appointment_start(day, time)
+                if start is None:
+                    skipped += 1
+                    continue
+                end = start + timedelta(minutes=duration) if duration is not None else None
+                updates.append({'id': id, 'start': start, 'end': end})
+            if updates:
+                stmt = text('UPDATE bookings SET start_at = :start, end_at = :end WHERE id = :id').bindparams(
+                    bindparam('start', type_=DateTime), bindparam('end', type_=DateTime))
+                conn.execute(stmt, updates)
+            filled += len(updates)
+            last_id = rows[-1][0]
+        log('bookings: backfilled %d rows so far' % filled)
+    if skipped:
+        log('bookings: %d rows have an unparseable date/time and were left NULL' % skipped)
+
+
+def message_read_flag(db, log=print):
+    """Add messages.is_read; existing messages start out unread."""
+    with db.engine.begin() as conn:
+        _add_columns(conn, 'messages', [('is_read', 'BOOLEAN NOT NULL DEFAULT 0')])
+
+
+# Applied in order; the schema_version table records the last one applied.
+# Each step must be safe to re-run against a database created by create_all().
+MIGRATIONS = [
+    (1, booking_times),
+    (2, message_read_flag),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(db):
+    with db.engine.begin() as conn:
+        conn.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+        return conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def upgrade(db, log=print):
+    """Apply every migration newer than the database's schema version."""
+    version = current_version(db)
+    for number, step in MIGRATIONS:
+        if number <= version:
+            continue
+        log('Applying migration %d: %s' % (number, step.__name__))
+        step(db, log=log)
+        with db.engine.begin() as conn:
+            conn.execute(text('INSERT INTO schema_version (version) VALUES (:v)'), {'v': number})
+
+
+def schema_fingerprint(db):
+    """Digest of SCHEMA_VERSION and the models' tables, columns and indexes.
+    It changes whenever a deploy needs create_all(), ensure_indexes() or a
+    migration to run, and costs nothing to compute (no database access)."""
+    parts = ['version %d' % SCHEMA_VERSION]
+    for table in sorted(db.metadata.sorted_tables, key=lambda t: t.name):
+        parts.append(table.name)
+        parts += ['%s %s %s' % (c.name, c.type, c.nullable) for c in table.columns]
+        parts += sorted(index.name for index in table.indexes)
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+
+def schema_is_current(db):
+    """True if a full startup check already ran against this exact schema
+    (one single-row SELECT; False if the table doesn't exist yet)."""
+    try:
+        with db.engine.connect() as conn:
+            stored = conn.execute(text('SELECT fingerprint FROM schema_fingerprint')).scalar()
+    except DBAPIError:
+        return False
+    return stored == schema_fingerprint(db)
+
+
+def record_schema(db):
+    """Remember that the startup checks passed for the current models."""
+    with db.engine.begin() as conn:
+        conn.execute(text('CREATE TABLE IF NOT EXISTS schema_fingerprint (fingerprint VARCHAR(40) NOT NULL)'))
+        conn.execute(text('DELETE FROM schema_fingerprint'))
+        conn.execute(text('INSERT INTO schema_fingerprint (fingerprint) VALUES (:f)'), {'f': schema_fingerprint(db)})
@@ -0,0 +1,95 @@
+import base64
+import json
+from flask import request, url_for
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decode a cursor made by encode_cursor; raises ValueError if it is
+    malformed or does not hold `size` values."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def order_by(ordering):
+    """ordering is a list of (column, descending) pairs, ending in a unique column."""
+    return [col.desc() if desc else col.asc() for col, desc in ordering]
+
+
+def after(ordering, values):
+    """WHERE clause selecting rows that sort strictly after `values`.
+
+    Expanded into (a > x) OR (a = x AND b > y) ... so that mixed directions
+    work and each branch can still use a composite index on the columns.
+    """
+    clauses = []
+    for i, (col, desc) in enumerate(ordering):
+        prefix = [c == v for (c, _), v in zip(ordering[:i], values[:i])]
+        clauses.append(and_(*prefix, col < values[i] if desc else col > values[i]))
+    return or_(*clauses)
+
+
+def keyset_query(query, ordering, cursor, limit, types=None):
+    """`query` (a Query or a select()) narrowed to the page after `cursor`,
+    ordered, with one extra row to tell whether another page follows."""
+    if cursor:
+        values = decode_cursor(cursor, len(ordering))
+        if types:
+            try:
+                values = [t(v) for t, v in zip(types, values)]
+            except (TypeError, ValueError):
+                raise ValueError('Invalid cursor')
+        query = query.filter(after(ordering, values))
+    return query.order_by(*order_by(ordering)).limit(limit + 1)
+
+
+def split_page(rows, limit, key):
+    """(rows, next_cursor) from the rows keyset_query() fetched."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+def keyset_page(query, ordering, cursor, limit, key, types=None):
+    """Fetch one page of `query` after `cursor`.
+
+    `key(row)` returns the row's values for the ordering columns; `types`
+    optionally converts decoded cursor values back (e.g. to datetime).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    return split_page(keyset_query(query, ordering, cursor, limit, types).all(), limit, key)
+
+
+def _query_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, tuple):
+        return ','.join(value)
+    return value
+
+
+def next_page_headers(cursor, filters=()):
+    """X-Next-Cursor and Link headers pointing at the page after this one.
+
+    The Link is built from the parsed `filters` ((name, value) pairs), not
+    from request.args: cached pages are shared by every query string that
+    parses to the same filters, so the raw args are those of whichever
+    request happened to fill the cache.
+    """
+    if cursor is None:
+        return None
+    args = {name: _query_value(value) for name, value in filters}
+    args['cursor'] = cursor
+    return {'X-Next-Cursor': cursor, 'Link': '<%s>; rel="next"' % url_for(request.endpoint, **args)}
@@ -0,0 +1,250 @@
+import argparse
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from werkzeug.serving import WSGIRequestHandler, make_server
+from .startup import STARTED_AT_ENV
+
+log = logging.getLogger(__name__)
+
+# Handed to the re-executed master on SIGHUP
+LISTEN_FD_ENV = 'SERVE_LISTEN_FD'
+OLD_WORKERS_ENV = 'SERVE_OLD_WORKERS'
+
+
+def default_workers():
+    """2 x CPUs + 1: one busy on the CPU while another waits on the database."""
+    return (os.cpu_count() or 1) * 2 + 1
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # Idle keep-alive connections are closed after this many seconds, so a
+    # worker that is shutting down isn't held open by clients that went quiet
+    timeout = 5
+
+
+class PreforkServer:
+    """Pre-forking WSGI server: load once, fork `workers` processes.
+
+    load() runs in the master before any worker exists (import, schema
+    checks, warm-up), so every worker starts with the models, compiled
+    templates and the catalog cache already in memory. Each worker serves
+    the shared listening socket with a threaded Werkzeug server and exits
+    gracefully after `max_requests` requests (plus up to `jitter` more, so
+    workers don't all restart together); the master forks a replacement.
+
+    Signals to the master: SIGTERM/SIGINT stop (in-flight requests finish,
+    up to `graceful_timeout` seconds); SIGHUP reloads without dropping a
+    connection. The master runs the `check` command (say, importing the app
+    module; it must exit 0), then re-execs itself with the listening socket
+    inherited. The new master loads the new code and starts its workers,
+    and only then stops the old ones.
+    """
+
+    def __init__(self, load, host, port, workers=None, max_requests=0, jitter=0.1, graceful_timeout=30,
+                 after_fork=None, worker_exit=None, check=None):
+        self.load = load
+        self.host = host
+        self.port = port
+        self.workers = workers or default_workers()
+        self.max_requests = max_requests
+        self.jitter = jitter
+        self.graceful_timeout = graceful_timeout
+        self.after_fork = after_fork
+        self.worker_exit = worker_exit
+        self.check = check
+        self.children = set()
+        self.retiring = {}  # pid -> time it was asked to stop
+        self.app = None
+        self.sock = None
+        self._signals = []
+
+    # --- master ---
+
+    def run(self):
+        self.sock = self._listen()
+        old = [int(pid) for pid in os.environ.pop(OLD_WORKERS_ENV, '').split(',') if pid]
+        started = time.monotonic()
+        self.app = self.load()
+        log.info('master %d loaded the app in %.0f ms; forking %d workers on %s:%d',
+                 os.getpid(), (time.monotonic() - started) * 1000, self.workers, self.host, self.port)
+        wakeup = self._install_signals()
+        for _ in range(self.workers):
+            self._spawn()
+        # After a reload the new generation is up; the previous one can drain now
+        for pid in old:
+            self._retire(pid)
+        try:
+            while True:
+                select.select([wakeup], [], [], 1.0)
+                try:
+                    while os.read(wakeup, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+                self._reap()
+                signals, self._signals = self._signals, []
+                if signal.SIGTERM in signals or signal.SIGINT in signals:
+                    break
+                if signal.SIGHUP in signals:
+                    self._reload()
+                self._kill_stragglers()
+                while len(self.children) < self.workers:
+                    self._spawn()
+        finally:
+            self._stop_all()
+
+    def _listen(self):
+        fd = os.environ.pop(LISTEN_FD_ENV, None)
+        if fd is not None:
+            sock = socket.socket(fileno=int(fd))
+        else:
+            sock = socket.create_server((self.host, self.port), backlog=2048, reuse_port=False)
+        # Idle workers must not block in accept() while another took the connection
+        sock.setblocking(False)
+        return sock
+
+    def _install_signals(self):
+        read, write = os.pipe()
+        os.set_blocking(read, False)
+        os.set_blocking(write, False)
+        signal.set_wakeup_fd(write)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, lambda signum, frame: self._signals.append(signum))
+        return read
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return pid
+        try:
+            self._serve()
+        except BaseException:
+            log.exception('worker %d crashed', os.getpid())
+            os._exit(1)
+        os._exit(0)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if pid in self.children:
+                self.children.discard(pid)
+                code = os.waitstatus_to_exitcode(status)
+                if code:
+                    log.warning('worker %d exited with %s', pid, code)
+            self.retiring.pop(pid, None)
+
+    def _retire(self, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        self.retiring[pid] = time.monotonic()
+
+    def _kill_stragglers(self):
+        for pid, since in list(self.retiring.items()):
+            if time.monotonic() - since > self.graceful_timeout:
+                log.warning('worker %d did not stop within %ds; killing it', pid, self.graceful_timeout)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.retiring.pop(pid)
+
+    def _reload(self):
+        if self.check and subprocess.run(self.check).returncode:
+            log.error('reload aborted: %s failed; still serving the running code', ' '.join(self.check))
+            return
+        log.info('reloading: re-executing the master, %d workers keep serving meanwhile', len(self.children))
+        os.set_inheritable(self.sock.fileno(), True)
+        env = dict(os.environ)
+        env[LISTEN_FD_ENV] = str(self.sock.fileno())
+        env[OLD_WORKERS_ENV] = ','.join(str(pid) for pid in self.children | set(self.retiring))
+        env[STARTED_AT_ENV] = str(time.time())
+        signal.set_wakeup_fd(-1)
+        os.execve(sys.executable, getattr(sys, 'orig_argv', [sys.executable] + sys.argv), env)
+
+    def _stop_all(self):
+        for pid in list(self.children):
+            self._retire(pid)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.retiring and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.retiring):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._reap()
+
+    # --- worker ---
+
+    def _serve(self):
+        for signum in (signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_IGN)  # the master decides
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.set_wakeup_fd(-1)
+        if self.after_fork:
+            self.after_fork()
+        limit = self.max_requests + random.randint(0, int(self.max_requests * self.jitter))
+        served = [0]
+        lock = threading.Lock()
+        stopping = threading.Event()
+
+        def stop():
+            if not stopping.is_set():
+                stopping.set()
+                threading.Thread(target=server.shutdown, daemon=True).start()
+
+        def counted(environ, start_response):
+            with lock:
+                served[0] += 1
+                if limit and served[0] == limit:
+                    stop()
+            return self.app(environ, start_response)
+
+        server = make_server(self.host, self.port, counted, threaded=True,
+                             request_handler=_RequestHandler, fd=self.sock.fileno())
+        # Let server_close() wait for requests still being handled
+        server.daemon_threads = False
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+        server.serve_forever()
+        server.server_close()
+        if self.worker_exit:
+            self.worker_exit()
+        if limit and served[0] >= limit:
+            log.info('worker %d recycled after %d requests', os.getpid(), served[0])
+
+
+def serve_command(config, load, argv, port, check_module=None, after_fork=None, worker_exit=None):
+    """The `serve` subcommand; options default to the SERVE_* keys of `config`."""
+    parser = argparse.ArgumentParser(prog='serve', description='Pre-forking server. SIGHUP reloads, SIGTERM stops.')
+    parser.add_argument('--host', default=config.get('SERVE_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=port)
+    parser.add_argument('--workers', type=int, default=config.get('SERVE_WORKERS') or default_workers())
+    parser.add_argument('--max-requests', type=int, default=config.get('SERVE_MAX_REQUESTS', 10000),
+                        help='recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--graceful-timeout', type=int, default=config.get('SERVE_GRACEFUL_TIMEOUT', 30))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s')
+    check = None
+    if check_module:
+        # Import the new code the way this process found its modules
+        check = [sys.executable, '-c', 'import sys; sys.path[:0] = %r; import %s' % (sys.path, check_module)]
+    PreforkServer(load, args.host, args.port, args.workers, args.max_requests,
+                  graceful_timeout=args.graceful_timeout, after_fork=after_fork,
+                  worker_exit=worker_exit, check=check).run()
@@ -0,0 +1,171 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, session as client_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.sql.dml import UpdateBase
+from .storage import engine_options
+
+log = logging.getLogger(__name__)
+REPLICA_BIND = 'replica'
+
+
+def replica_binds(url):
+    """SQLALCHEMY_BINDS entry for an optional replica URL (None/'' -> no replica)."""
+    return {REPLICA_BIND: dict(engine_options(url), url=url)} if url else {}
+
+
+def read_only(view):
+    """Mark a view as safe to serve from the read replica."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def on_primary():
+    """Read from the primary inside the block, even in a @read_only view.
+
+    For loaders whose result outlives the request (the catalog cache): it is
+    kept under the current revision, and a replica still within
+    REPLICA_MAX_LAG may not have the write that bumped it yet.
+    """
+    if not has_request_context() or not g.get('read_only'):
+        yield
+        return
+    g.read_only = False
+    try:
+        yield
+    finally:
+        g.read_only = True
+
+
+class RoutingSession(Session):
+    """Session that sends reads from @read_only views to the replica.
+
+    Flushes, INSERT/UPDATE/DELETE statements and sessions holding unflushed
+    changes always use the primary, as does every read while the router
+    says the replica may not have caught up (see ReplicaRouter.usable).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and has_request_context() and g.get('read_only')
+                and not self._flushing and not isinstance(clause, UpdateBase)
+                and not (self.new or self.dirty or self.deleted)):
+            router = current_app.extensions.get('replica_router')
+            if router is not None and router.usable():
+                router.routed['replica'] += 1
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """Decides whether the read replica can serve reads right now.
+
+    The replica is used only while its last health check (at most every
+    REPLICA_CHECK_INTERVAL seconds) reported a lag within REPLICA_MAX_LAG.
+    After any commit that wrote something, reads stay on the primary for
+    REPLICA_MAX_LAG seconds, in this process and, through the session
+    cookie, for the client that wrote, so nobody reads their own write back
+    from a replica that hasn't applied it yet. If the replica is down or
+    lagging, reads fall back to the primary until the next check.
+    """
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.routed = {'replica': 0}
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._healthy = False
+        self._lag = None
+        self._error = None
+        self._last_write = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REPLICA_MAX_LAG', 2)
+        app.config.setdefault('REPLICA_CHECK_INTERVAL', 5)
+        self.app = app
+        self.enabled = REPLICA_BIND in (app.config.get('SQLALCHEMY_BINDS') or {})
+        if not self.enabled:
+            return
+        app.extensions['replica_router'] = self
+        self.max_lag = app.config['REPLICA_MAX_LAG']
+        self.interval = app.config['REPLICA_CHECK_INTERVAL']
+
+        @event.listens_for(self.db.session, 'after_flush')
+        def _flushed(session, flush_context):
+            session.info['wrote'] = True
+
+        @event.listens_for(self.db.session, 'do_orm_execute')
+        def _executed(state):
+            if not state.is_select:
+                state.session.info['wrote'] = True
+
+        @event.listens_for(self.db.session, 'after_commit')
+        def _committed(session):
+            if session.info.pop('wrote', False):
+                self.note_write()
+
+        @event.listens_for(self.db.session, 'after_rollback')
+        def _rolled_back(session):
+            session.info.pop('wrote', None)
+
+    def note_write(self):
+        self._last_write = time.time()
+        # Only clients that already carry a session (e.g. logged-in admins) get the marker
+        if has_request_context() and client_session:
+            client_session['_replica_after'] = self._last_write + self.max_lag
+
+    def usable(self):
+        now = time.time()
+        if now - self._last_write < self.max_lag:
+            return False
+        if client_session.get('_replica_after', 0) > now:
+            return False
+        if now - self._checked_at >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self._check()
+            finally:
+                self._checked_at = time.time()
+                self._lock.release()
+        return self._healthy
+
+    def _check(self):
+        try:
+            with self.db.engines[REPLICA_BIND].connect() as conn:
+                self._lag = self._replication_lag(conn)
+            self._error = None
+        except Exception as e:
+            self._lag, self._error = None, str(e)
+        healthy = self._lag is not None and self._lag <= self.max_lag
+        if healthy != self._healthy:
+            log.warning('read replica %s (lag=%s, error=%s)', 'in use' if healthy else 'bypassed', self._lag, self._error)
+        self._healthy = healthy
+
+    def _replication_lag(self, conn):
+        """Seconds the replica is behind, or None if replication is broken."""
+        if conn.dialect.name != 'mysql':
+            conn.execute(text('SELECT 1'))
+            return 0
+        for statement, column in (('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+                                  ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')):
+            try:
+                row = conn.execute(text(statement)).mappings().first()
+            except Exception:
+                continue  # SHOW REPLICA STATUS needs MySQL 8.0.22+
+            # No status row: a plain read-only copy that isn't replicating
+            return 0 if row is None else row[column]
+        return None
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        return {'enabled': True, 'healthy': self._healthy, 'lag': self._lag, 'error': self._error,
+                'max_lag': self.max_lag, 'reads_on_replica': self.routed['replica']}
@@ -0,0 +1,75 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import abort, current_app, request
+from .compression import choose_encoding, compress_bytes, encoded_etag
+from .replica import on_primary
+
+DEFAULT_CACHE_CONTROL = 'public, no-cache'
+
+
+class CachedBody:
+    """A serialized JSON payload plus the validators derived from it.
+
+    The ETag is a hash of the bytes, so it stays valid across restarts and
+    worker processes. Last-Modified is when this copy was built, which is
+    never earlier than the write that produced the content. Compressed
+    variants are built on first use and kept next to the body, so each
+    revision is compressed once per encoding.
+    """
+    __slots__ = ('data', 'etag', 'last_modified', 'variants', 'headers')
+
+    def __init__(self, data, headers=None):
+        self.data = data
+        self.headers = headers or {}
+        self.etag = hashlib.sha1(data).hexdigest()
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.variants = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def encoded(self, encoding, level):
+        data = self.variants.get(encoding)
+        if data is None:
+            # Racing threads may both compress; the results are identical
+            data = self.variants[encoding] = compress_bytes(self.data, encoding, level)
+        return data
+
+    @classmethod
+    def from_payload(cls, payload):
+        """payload may also be a (payload, headers) tuple, like a view's return value."""
+        headers = None
+        if isinstance(payload, tuple):
+            payload, headers = payload
+        if payload is None:
+            return None
+        return cls(current_app.json.response(payload).get_data(), headers)
+
+
+def catalog_response(cache, table, key, loader):
+    """Serve loader()'s payload through the catalog cache as a conditional
+    JSON response. A matching If-None-Match/If-Modified-Since on a warm
+    cache is answered with 304 without calling the loader, which reads
+    from the primary (on_primary). With a CatalogSnapshot on the app,
+    entries it holds are served from there."""
+    app = current_app
+    snapshot = app.extensions.get('catalog_snapshot')
+    body = snapshot.get(table, key) if snapshot is not None else None
+    if body is None:
+        with on_primary():
+            body = cache.get_or_load(table, key, lambda: CachedBody.from_payload(loader()))
+    if body is None:
+        abort(404)
+    encoding = choose_encoding(app, len(body)) if 'COMPRESS_ENABLED' in app.config else None
+    if encoding is None:
+        response = app.response_class(body.data, mimetype='application/json')
+    else:
+        level = app.config['COMPRESS_CACHED_BR_QUALITY' if encoding == 'br' else 'COMPRESS_CACHED_GZIP_LEVEL']
+        response = app.response_class(body.encoded(encoding, level), mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+    response.headers.extend(body.headers)
+    response.vary.add('Accept-Encoding')
+    response.set_etag(encoded_etag(body.etag, encoding))
+    response.last_modified = body.last_modified
+    response.headers['Cache-Control'] = app.config.get('CACHE_CONTROL', {}).get(table, DEFAULT_CACHE_CONTROL)
+    return response.make_conditional(request)
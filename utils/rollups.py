@@ -0,0 +1,148 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import event, func, inspect, insert, literal, select
+from .counters import increment
+
+GROUPS = ('day', 'service', 'category', 'stylist')
+MAX_RANGE_DAYS = 731
+NO_STYLIST = 0  # rollup key for bookings without a stylist
+
+
+def _day(start_at):
+    return start_at.date() if start_at is not None else None
+
+
+def _apply(connection, BookingRollup, Service, changes):
+    """changes: [(service_id, stylist_id, start_at, +1/-1)] -> one upsert.
+    Revenue and minutes use the service's price/duration as of now."""
+    changes = [c for c in changes if c[0] is not None and c[2] is not None]
+    if not changes:
+        return
+    ids = {c[0] for c in changes}
+    services = {row.id: row for row in connection.execute(
+        select(Service.id, Service.category, Service.price, Service.duration).where(Service.id.in_(ids)))}
+    totals = defaultdict(lambda: [0, 0, 0])
+    for service_id, stylist_id, start_at, sign in changes:
+        service = services.get(service_id)
+        if service is None:
+            continue
+        total = totals[(_day(start_at), service_id, stylist_id or NO_STYLIST, service.category)]
+        total[0] += sign
+        total[1] += sign * service.price
+        total[2] += sign * service.duration
+    rows = [{'day': day, 'service_id': service_id, 'stylist_id': stylist_id, 'category': category,
+             'bookings': n, 'revenue_cents': revenue, 'minutes': minutes}
+            for (day, service_id, stylist_id, category), (n, revenue, minutes) in totals.items() if any((n, revenue, minutes))]
+    increment(connection, BookingRollup.__table__, ['day', 'service_id', 'stylist_id', 'category'], rows)
+
+
+def watch_rollups(db, BookingRollup, Booking, Service):
+    """Maintain the daily rollups in the same transaction as booking writes:
+    ORM inserts, deletes and reschedules in after_flush, bulk INSERTs of
+    bookings (the batch endpoint) from their parameters."""
+
+    @event.listens_for(db.session, 'after_flush')
+    def _flushed(session, flush_context):
+        changes = []
+        for obj in session.new:
+            if isinstance(obj, Booking):
+                changes.append((obj.service_id, obj.stylist_id, obj.start_at, 1))
+        for obj in session.deleted:
+            if isinstance(obj, Booking):
+                changes.append((obj.service_id, obj.stylist_id, obj.start_at, -1))
+        for obj in session.dirty:
+            if not isinstance(obj, Booking):
+                continue
+            state = inspect(obj)
+            old = {}
+            for name in ('service_id', 'stylist_id', 'start_at'):
+                history = state.attrs[name].history
+                if history.has_changes() and history.deleted:
+                    old[name] = history.deleted[0]
+            if old:
+                changes.append((old.get('service_id', obj.service_id), old.get('stylist_id', obj.stylist_id),
+                                old.get('start_at', obj.start_at), -1))
+                changes.append((obj.service_id, obj.stylist_id, obj.start_at, 1))
+        _apply(session.connection(), BookingRollup, Service, changes)
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def _bulk_insert(state):
+        if not state.is_insert or state.bind_mapper is None or state.bind_mapper.class_ is not Booking:
+            return
+        params = state.parameters
+        rows = params if isinstance(params, list) else [params] if params else []
+        _apply(state.session.connection(), BookingRollup, Service,
+               [(row.get('service_id'), row.get('stylist_id'), row.get('start_at'), 1) for row in rows])
+
+
+def rebuild_rollups(db, BookingRollup, Booking, Service):
+    """Recompute every rollup from the bookings table in one transaction
+    (backfill, or after service prices changed). Returns the row count."""
+    day = func.date(Booking.start_at)
+    stylist = func.coalesce(Booking.stylist_id, literal(NO_STYLIST))
+    source = (select(day, Booking.service_id, stylist, Service.category, func.count(Booking.id),
+                     func.sum(Service.price), func.sum(Service.duration))
+              .join(Service, Service.id == Booking.service_id)
+              .where(Booking.start_at.isnot(None))
+              .group_by(day, Booking.service_id, stylist, Service.category))
+    table = BookingRollup.__table__
+    db.session.execute(table.delete())
+    db.session.execute(insert(table).from_select(
+        ['day', 'service_id', 'stylist_id', 'category', 'bookings', 'revenue_cents', 'minutes'], source))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(table).scalar()
+
+
+def ensure_rollups(db, BookingRollup, Booking, Service):
+    """Backfill the rollups on first start if bookings exist but rollups don't."""
+    if db.session.query(BookingRollup.day).first() is None and db.session.query(Booking.id).first() is not None:
+        rebuild_rollups(db, BookingRollup, Booking, Service)
+
+
+def parse_analytics_args(args):
+    """Returns (first day, last day, group). Defaults to the last 30 days by service."""
+    try:
+        last = date.fromisoformat(args['date_to']) if args.get('date_to') else date.today()
+        first = date.fromisoformat(args['date_from']) if args.get('date_from') else last - timedelta(days=29)
+    except ValueError:
+        raise ValueError('date_from/date_to must be YYYY-MM-DD dates')
+    if first > last:
+        raise ValueError('date_from must not be after date_to')
+    if (last - first).days >= MAX_RANGE_DAYS:
+        raise ValueError('The range can span at most %d days' % MAX_RANGE_DAYS)
+    group = args.get('group_by', 'service')
+    if group not in GROUPS:
+        raise ValueError('group_by must be one of: %s' % ', '.join(GROUPS))
+    return first, last, group
+
+
+def rollup_report(db, BookingRollup, Service, Stylist, first, last, group):
+    """Booked bookings, revenue (cents) and minutes per `group` over [first, last].
+
+    Reads only the rollup rows of the range (a primary-key range scan on
+    day), so a year is a few thousand rows whatever the booking volume.
+    """
+    r = BookingRollup
+    sums = [func.sum(r.bookings), func.sum(r.revenue_cents), func.sum(r.minutes)]
+    if group == 'day':
+        keys = [r.day, r.day]
+    elif group == 'service':
+        keys = [r.service_id, func.max(Service.title)]
+    elif group == 'category':
+        keys = [r.category, r.category]
+    else:
+        keys = [r.stylist_id, func.max(Stylist.name)]
+    stmt = select(*keys, *sums).where(r.day >= first, r.day <= last).group_by(keys[0]).order_by(keys[0])
+    if group == 'service':
+        stmt = stmt.join(Service, Service.id == r.service_id)
+    elif group == 'stylist':
+        stmt = stmt.outerjoin(Stylist, Stylist.id == r.stylist_id)
+    rows = []
+    for key, label, bookings, revenue, minutes in db.session.execute(stmt):
+        if group == 'day':
+            key = label = str(key)
+        rows.append({'key': key, 'label': label if label is not None else 'No stylist',
+                     'bookings': int(bookings or 0), 'revenue_cents': int(revenue or 0), 'minutes': int(minutes or 0)})
+    totals = {name: sum(row[name] for row in rows) for name in ('bookings', 'revenue_cents', 'minutes')}
+    return {'date_from': first.isoformat(), 'date_to': last.isoformat(), 'group_by': group,
+            'rows': rows, 'totals': totals}
@@ -0,0 +1,15 @@
+from sqlalchemy import inspect
+
+
+def ensure_indexes(db):
+    """Create indexes declared on the models that an existing database is
+    missing. db.create_all() only adds them together with a new table."""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(db.engine)
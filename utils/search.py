@@ -0,0 +1,91 @@
+import re
+from sqlalchemy import inspect, or_, text
+
+SEARCH_PAGE_SIZE = 20
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE messages_fts USING fts5(
+        subject, message, name, email,
+        content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, subject, message, name, email)
+        VALUES (new.id, new.subject, new.message, new.name, new.email);
+    END""",
+    """CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, subject, message, name, email)
+        VALUES ('delete', old.id, old.subject, old.message, old.name, old.email);
+    END""",
+    """CREATE TRIGGER messages_fts_au AFTER UPDATE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, subject, message, name, email)
+        VALUES ('delete', old.id, old.subject, old.message, old.name, old.email);
+        INSERT INTO messages_fts(rowid, subject, message, name, email)
+        VALUES (new.id, new.subject, new.message, new.name, new.email);
+    END""",
+    # Index whatever was already in the table
+    "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')",
+]
+MYSQL_FULLTEXT_DDL = 'ALTER TABLE messages ADD FULLTEXT INDEX ft_messages (subject, message, name, email)'
+
+
+def ensure_message_search(db):
+    """Create the full-text index over messages if it is missing.
+
+    SQLite gets an external-content FTS5 table kept in sync by triggers, so
+    every write path (ORM, bulk inserts, raw SQL) is covered. MySQL gets a
+    FULLTEXT index, which InnoDB maintains itself. Other backends fall back
+    to LIKE in search_messages().
+    """
+    dialect = db.engine.dialect.name
+    inspector = inspect(db.engine)
+    if dialect == 'sqlite':
+        if 'messages_fts' in inspector.get_table_names():
+            return
+        with db.engine.begin() as conn:
+            for ddl in SQLITE_FTS_DDL:
+                conn.execute(text(ddl))
+    elif dialect == 'mysql':
+        if any(ix['name'] == 'ft_messages' for ix in inspector.get_indexes('messages')):
+            return
+        with db.engine.begin() as conn:
+            conn.execute(text(MYSQL_FULLTEXT_DDL))
+
+
+def _terms(query):
+    return re.findall(r'\w+', query, re.UNICODE)
+
+
+def search_messages(db, Message, query, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Messages matching every word of `query`, best match first.
+
+    Returns (messages, has_more). Pages use LIMIT/OFFSET: ranking has to
+    score every match anyway, and result pages are small and shallow.
+    """
+    terms = _terms(query)
+    if not terms:
+        return [], False
+    offset = (page - 1) * per_page
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        # Quote each term so user input can't inject FTS5 syntax; prefix-match the words
+        match = ' '.join('"%s"*' % t for t in terms)
+        # bm25 weights favour subject, then name/email, then the message body
+        stmt = text("""SELECT messages.* FROM messages_fts JOIN messages ON messages.id = messages_fts.rowid
+                       WHERE messages_fts MATCH :match
+                       ORDER BY bm25(messages_fts, 4.0, 1.0, 2.0, 2.0), messages.id DESC
+                       LIMIT :limit OFFSET :offset""")
+        rows = Message.query.from_statement(stmt).params(match=match, limit=per_page + 1, offset=offset).all()
+    elif dialect == 'mysql':
+        match = ' '.join('+%s*' % t for t in terms)
+        stmt = text("""SELECT * FROM messages
+                       WHERE MATCH(subject, message, name, email) AGAINST (:match IN BOOLEAN MODE)
+                       ORDER BY MATCH(subject, message, name, email) AGAINST (:match IN BOOLEAN MODE) DESC, id DESC
+                       LIMIT :limit OFFSET :offset""")
+        rows = Message.query.from_statement(stmt).params(match=match, limit=per_page + 1, offset=offset).all()
+    else:
+        q = Message.query
+        for t in terms:
+            pattern = '%' + t + '%'
+            q = q.filter(or_(Message.subject.ilike(pattern), Message.message.ilike(pattern),
+                             Message.name.ilike(pattern), Message.email.ilike(pattern)))
+        rows = q.order_by(Message.created_at.desc(), Message.id.desc()).offset(offset).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
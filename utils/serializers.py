@@ -0,0 +1,172 @@
+import logging
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import load_only
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib json module is always available
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+
+def _split_commas(value):
+    return value.split(',') if value else []
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+class Field:
+    """One key of a schema: read from `attr` (defaults to the key) and
+    passed through `convert` when given."""
+    __slots__ = ('key', 'attr', 'convert')
+
+    def __init__(self, key, attr=None, convert=None):
+        self.key = key
+        self.attr = attr or key
+        self.convert = convert
+
+
+class Schema:
+    """The JSON shape of a model, compiled into a plain function.
+
+    Fields are names (key and attribute alike), Field objects, or
+    key='attribute' keywords for renamed keys. The first call for a set
+    of keys generates and caches the equivalent of a hand-written dict
+    literal ({'id': obj.id, ...}), so there is no per-field loop or
+    getattr() at serialization time:
+
+        SERVICE = Schema('id', 'title', isFeatured='is_featured')
+        SERVICE(service)  ->  {'id': 1, 'title': ..., 'isFeatured': True}
+
+    For reads that skip the ORM, columns() gives the columns to select
+    and row_serializer() the matching function over plain row tuples
+    ({'id': row[0], ...}).
+    """
+
+    def __init__(self, *fields, **renamed):
+        fields = [f if isinstance(f, Field) else Field(f) for f in fields]
+        fields += [Field(key, attr) for key, attr in renamed.items()]
+        self.fields = {f.key: f for f in fields}
+        self.keys = tuple(self.fields)
+        self._compiled = {}
+        self._full = self.serializer()
+        self._full_rows = self.row_serializer()
+
+    def __call__(self, obj):
+        return self._full(obj)
+
+    def many(self, objs, keys=None):
+        return list(map(self._full if keys is None else self.serializer(keys), objs))
+
+    def many_rows(self, rows, keys=None):
+        return list(map(self._full_rows if keys is None else self.row_serializer(keys), rows))
+
+    def serializer(self, keys=None):
+        """The compiled function for `keys` (all fields when None), in schema order."""
+        return self._get(keys, False)
+
+    def row_serializer(self, keys=None):
+        """serializer() for rows whose leading columns are columns(model, keys)."""
+        return self._get(keys, True)
+
+    def columns(self, model, keys=None):
+        """The columns of `model` behind `keys` (all fields when None), in schema order."""
+        keys = self.keys if keys is None else [k for k in self.keys if k in keys]
+        return [getattr(model, self.fields[k].attr) for k in keys]
+
+    def _get(self, keys, rows):
+        keys = self.keys if keys is None else tuple(k for k in self.keys if k in keys)
+        fn = self._compiled.get((keys, rows))
+        if fn is None:
+            fn = self._compiled[(keys, rows)] = self._compile(keys, rows)
+        return fn
+
+    def parse_fields(self, value):
+        """The keys listed in a ?fields=a,b value, in schema order, or None
+        (all fields) when it is empty. Raises ValueError on unknown keys."""
+        names = [n.strip() for n in (value or '').split(',') if n.strip()]
+        if not names:
+            return None
+        unknown = [n for n in names if n not in self.fields]
+        if unknown:
+            raise ValueError('Unknown field(s): %s' % ', '.join(unknown))
+        return tuple(k for k in self.keys if k in names)
+
+    def load_only(self, model, keys, *columns):
+        """A load_only() option for the columns behind `keys` plus `columns`;
+        the others are deferred and never read for these rows."""
+        return load_only(*[getattr(model, self.fields[k].attr) for k in keys], *columns)
+
+    def _compile(self, keys, rows=False):
+        namespace, items = {}, []
+        for i, key in enumerate(keys):
+            field = self.fields[key]
+            if not field.attr.isidentifier():
+                raise ValueError('%r is not an attribute name' % field.attr)
+            value = 'obj[%d]' % i if rows else 'obj.%s' % field.attr
+            if field.convert is not None:
+                namespace['convert_%d' % i] = field.convert
+                value = 'convert_%d(%s)' % (i, value)
+            items.append('%r: %s' % (key, value))
+        source = 'def serialize(obj):\n    return {%s}\n' % ', '.join(items)
+        exec(compile(source, '<schema %s%s>' % (','.join(keys), ' rows' if rows else ''), 'exec'), namespace)
+        return namespace['serialize']
+
+
+# One schema per model, shared by every route that returns it (keys as in shared/schema.ts)
+SERVICE = Schema('id', 'title', 'description', 'category', 'price', 'duration', 'image', isFeatured='is_featured')
+STYLIST = Schema('id', 'name', 'role', 'bio', 'image', Field('specialties', convert=_split_commas))
+TESTIMONIAL = Schema('id', 'name', 'role', 'content', 'rating', 'avatar')
+OFFER = Schema('id', 'title', 'description', 'code', 'discount', 'expiry')
+BOOKING = Schema('id', 'name', 'email', 'phone', Field('serviceId', 'service_id'), Field('stylistId', 'stylist_id'),
+                 'date', 'time', 'message', Field('createdAt', 'created_at', _isoformat))
+MESSAGE = Schema('id', 'name', 'email', 'subject', 'message', Field('isRead', 'is_read'),
+                 Field('createdAt', 'created_at', _isoformat))
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask's JSON provider with orjson doing the encoding and decoding.
+
+    Output matches the default provider's apart from non-ASCII text,
+    which is sent as UTF-8 instead of \\u escapes: keys are sorted and
+    compact, and dates, decimals, UUIDs and dataclasses still go through
+    Flask's default(). Pretty-printed (debug) responses use the stdlib.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def dumpb(self, obj):
+        option = self.option | orjson.OPT_SORT_KEYS if self.sort_keys else self.option
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumpb(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        data = self.dumpb(self._prepare_response_obj(args, kwargs))
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the JSON_BACKEND provider: 'orjson' when it is installed, else 'json'."""
+    app.config.setdefault('JSON_BACKEND', 'orjson')
+    if app.config['JSON_BACKEND'] == 'orjson':
+        if orjson is None:
+            log.warning('JSON_BACKEND is orjson but orjson is not installed; using the json module')
+        else:
+            app.json = OrjsonProvider(app)
@@ -0,0 +1,286 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import event
+from .compression import brotli, compress_bytes
+from .responses import CachedBody
+
+try:
+    import fcntl
+except ImportError:  # Windows: no writer lock; os.replace() still switches atomically
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'CATSNAP1'
+HEADER = struct.Struct('<8sI')  # magic, length of the JSON index that follows
+
+
+def entry_key(table, key):
+    return '%s:%r' % (table, key)
+
+
+class SnapshotBody:
+    """A response body inside the mapped snapshot; used like CachedBody.
+
+    The bytes stay in the file's pages, which every worker maps from the
+    same page cache. `data` copies them out per response, since WSGI
+    servers only accept bytes."""
+    __slots__ = ('_view', 'etag', 'last_modified', 'headers', '_variants')
+
+    def __init__(self, view, etag, last_modified, headers, variants):
+        self._view = view
+        self.etag = etag
+        self.last_modified = last_modified
+        self.headers = headers
+        self._variants = variants
+
+    def __len__(self):
+        return len(self._view)
+
+    @property
+    def data(self):
+        return bytes(self._view)
+
+    def encoded(self, encoding, level):
+        variant = self._variants.get(encoding)
+        if variant is not None:
+            return bytes(variant)
+        return compress_bytes(bytes(self._view), encoding, level)
+
+
+class _Mapping:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError('%s is not a catalog snapshot' % path)
+        meta = json.loads(self.map[HEADER.size:HEADER.size + size])
+        self.revisions = meta['revisions']
+        self.built_at = meta['built_at']
+        self.index = meta['entries']
+        self.view = memoryview(self.map)[HEADER.size + size:]
+
+    def body(self, name):
+        entry = self.index.get(name)
+        if entry is None:
+            return None
+        (offset, length), etag, modified, headers, variants = entry
+        return SnapshotBody(self.view[offset:offset + length], etag,
+                            datetime.fromtimestamp(modified, timezone.utc), headers,
+                            {encoding: self.view[o:o + n] for encoding, (o, n) in variants.items()})
+
+
+class CatalogSnapshot:
+    """Catalog responses shared by all worker processes through one file.
+
+    A writer serializes every entry the registered builders yield (JSON
+    bodies plus gzip/br variants, with ETags) into a new file and
+    os.replace()s it over CATALOG_SNAPSHOT_PATH. Workers mmap the file and
+    serve from it: one copy in the page cache however many workers run.
+    Before each read they stat() the path; a new file is mapped in one
+    swap, and its per-table revisions bump the same tables in the worker's
+    CatalogCache, so filtered pages cached per process go stale too.
+
+    A commit that changes a watched model schedules one rebuild in the
+    background of the process that committed (writers take turns on a
+    lock file). Until a file built after that commit lands, the process
+    reads those tables from its CatalogCache instead. Other workers keep
+    serving the previous file for those few milliseconds.
+    """
+
+    def __init__(self, db, cache, app=None):
+        self.db = db
+        self.cache = cache
+        self._builders = []
+        self._mapping = None
+        self._stale = {}  # table -> time.time() of the local commit not in the file yet
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.counts = {'hits': 0, 'remaps': 0, 'rebuilds': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get('CATALOG_SNAPSHOT_PATH') is None:
+            app.config['CATALOG_SNAPSHOT_PATH'] = os.path.join(app.instance_path, 'catalog.snapshot')
+        self.app = app
+        self.path = app.config['CATALOG_SNAPSHOT_PATH']
+        self.enabled = bool(self.path)
+        if self.enabled:
+            app.extensions['catalog_snapshot'] = self
+            app.before_request(self.refresh)
+
+    def entries(self, builder):
+        """Register builder() -> iterable of (table, key, payload). Keys and
+        payloads must be what the views pass to catalog_response()."""
+        self._builders.append(builder)
+        return builder
+
+    def watch(self, *models):
+        """Rebuild after commits that insert, update or delete these models."""
+        tables = {m: m.__tablename__ for m in models}
+
+        @event.listens_for(self.db.session, 'after_flush')
+        def _collect(session, flush_context):
+            touched = session.info.setdefault('snapshot_touched', set())
+            for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+                if type(obj) in tables:
+                    touched.add(tables[type(obj)])
+
+        @event.listens_for(self.db.session, 'after_commit')
+        def _committed(session):
+            touched = session.info.pop('snapshot_touched', None)
+            if touched and self.enabled:
+                self.schedule(touched)
+
+        @event.listens_for(self.db.session, 'after_rollback')
+        def _discard(session):
+            session.info.pop('snapshot_touched', None)
+
+    # --- reading ---
+
+    def _current(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        mapping = self._mapping
+        if mapping is not None and mapping.identity == (stat.st_ino, stat.st_mtime_ns):
+            return mapping
+        with self._lock:
+            if self._mapping is mapping:
+                new = _Mapping(self.path)
+                if mapping is not None:
+                    changed = [t for t, rev in new.revisions.items() if mapping.revisions.get(t) != rev]
+                    if changed:
+                        self.cache.bump(*changed)
+                for table, since in list(self._stale.items()):
+                    if new.built_at > since:
+                        del self._stale[table]
+                # The old map is closed once the last response slicing it is gone
+                self._mapping = new
+                self.counts['remaps'] += 1
+        return self._mapping
+
+    def refresh(self):
+        """Pick up a new file before the request runs, so that CatalogCache
+        entries read directly (not through catalog_response) are bumped too."""
+        self._current()
+
+    def get(self, table, key):
+        """The shared body for (table, key), or None to use the CatalogCache."""
+        if not self.enabled or table in self._stale:
+            return None
+        mapping = self._current()
+        body = mapping.body(entry_key(table, key)) if mapping is not None else None
+        if body is not None:
+            self.counts['hits'] += 1
+        return body
+
+    def has(self, table, key):
+        if not self.enabled or table in self._stale:
+            return False
+        mapping = self._current()
+        return mapping is not None and entry_key(table, key) in mapping.index
+
+    # --- writing ---
+
+    def schedule(self, tables):
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                self._stale.setdefault(table, now)
+            self._pending.update(tables)
+            if self._pid != os.getpid():
+                # Threads don't survive fork; each process starts its own writer
+                self._wake, self._idle = threading.Event(), threading.Event()
+                threading.Thread(target=self._run, name='catalog-snapshot', daemon=True).start()
+                self._pid = os.getpid()
+            self._idle.clear()
+        self._wake.set()
+
+    def flush(self, timeout=10):
+        """Wait for scheduled rebuilds; call before a worker exits so its
+        last write still reaches the other workers."""
+        if self._pid == os.getpid():
+            self._idle.wait(timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                tables, self._pending = self._pending, set()
+            try:
+                self.rebuild(tables)
+            except Exception:
+                log.exception('catalog snapshot rebuild failed; serving %s from the per-process cache', sorted(tables))
+            with self._lock:
+                if not self._pending:
+                    self._idle.set()
+
+    def rebuild(self, tables=None):
+        """Write a new snapshot from the database and switch it in. `tables`
+        get a new revision (all of them when None, e.g. at startup)."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            built_at = time.time()
+            with self.app.app_context():
+                try:
+                    entries = [(table, key, CachedBody.from_payload(payload))
+                               for builder in self._builders for table, key, payload in builder()]
+                finally:
+                    self.db.session.remove()
+            try:
+                revisions = _Mapping(self.path).revisions
+            except (OSError, ValueError):
+                revisions = {}
+            for table in {t for t, _, _ in entries} if tables is None else tables:
+                revisions[table] = revisions.get(table, 0) + 1
+            self._write(entries, revisions, built_at)
+        self.counts['rebuilds'] += 1
+        self._current()
+
+    def _write(self, entries, revisions, built_at):
+        config = self.app.config
+        levels = {'gzip': config.get('COMPRESS_CACHED_GZIP_LEVEL', 9), 'br': config.get('COMPRESS_CACHED_BR_QUALITY', 11)}
+        encodings = ['gzip'] + (['br'] if brotli is not None else [])
+        chunks, index, offset = [], {}, 0
+
+        def add(data):
+            nonlocal offset
+            chunks.append(data)
+            offset += len(data)
+            return [offset - len(data), len(data)]
+
+        for table, key, body in entries:
+            if body is None:
+                continue  # unknown ids are left to the views (404)
+            index[entry_key(table, key)] = [add(body.data), body.etag, body.last_modified.timestamp(), body.headers,
+                                            {e: add(compress_bytes(body.data, e, levels[e])) for e in encodings}]
+        meta = json.dumps({'revisions': revisions, 'built_at': built_at, 'entries': index}).encode('utf-8')
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(meta)))
+            f.write(meta)
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, self.path)
+
+    def stats(self):
+        mapping = self._mapping if self.enabled else None
+        return dict(self.counts, enabled=self.enabled, stale=sorted(self._stale),
+                    entries=len(mapping.index) if mapping else 0, bytes=len(mapping.map) if mapping else 0,
+                    revisions=mapping.revisions if mapping else {})
@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import jsonify
+from sqlalchemy import text
+from .migrations import record_schema, schema_is_current
+
+log = logging.getLogger(__name__)
+STARTED_AT_ENV = 'STARTUP_STARTED_AT'
+WARMUP_URLS = ('/api/services', '/api/stylists', '/api/testimonials', '/api/offers')
+
+
+def process_started():
+    """time.monotonic() value at which this process (or forked worker) started.
+    Read from /proc on Linux so interpreter start-up and imports count too;
+    elsewhere it falls back to now. A process that re-executed itself passes
+    the wall-clock time of the exec in STARTUP_STARTED_AT."""
+    started_at = os.environ.pop(STARTED_AT_ENV, None)
+    if started_at:
+        return time.monotonic() - (time.time() - float(started_at))
+    try:
+        with open('/proc/self/stat') as f:
+            ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.monotonic() - (uptime - ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return time.monotonic()
+
+
+class Startup:
+    """Cold start of a worker: schema checks, warm-up and readiness.
+
+    prepare() runs the startup checks (create_all, migrations, backfills,
+    seeding) and records the schema fingerprint. With FAST_START on, a later
+    start whose models match that fingerprint skips them after one SELECT.
+    warm_up() then opens pool connections, compiles every template and loads
+    the WARMUP_URLS into the catalog cache on a background thread;
+    /healthz/ready answers 503 until it is done. Time from process start to
+    ready is checked against STARTUP_BUDGET_MS and reported by stats().
+    """
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def _reset(self):
+        # A forked worker starts cold: its own clock, pool and warm-up thread
+        self._lock = threading.Lock()
+        self._thread = None
+        self.started = process_started()
+        self.state = 'starting'
+        self.schema_check = None
+        self.phases = {}
+        self.ready_ms = None
+        self.error = None
+
+    def init_app(self, app):
+        app.config.setdefault('FAST_START', False)
+        app.config.setdefault('STARTUP_BUDGET_MS', 2000)
+        app.config.setdefault('WARMUP_ON_START', True)
+        app.config.setdefault('WARMUP_URLS', WARMUP_URLS)
+        app.config.setdefault('WARMUP_CONNECTIONS', 4)
+        self.app = app
+        app.add_url_rule('/healthz/live', 'healthz_live', self.live)
+        app.add_url_rule('/healthz/ready', 'healthz_ready', self.ready)
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def prepare(self, checks):
+        """Call checks() unless FAST_START is on and the schema is current."""
+        with self.phase('schema'):
+            if self.app.config['FAST_START'] and schema_is_current(self.db):
+                self.schema_check = 'skipped'
+                return
+            checks()
+            record_schema(self.db)
+            self.schema_check = 'full'
+
+    def warm_up(self, wait=False):
+        """Start warming this process up, once (again after a failure)."""
+        with self._lock:
+            if self._thread is None or self.state == 'failed':
+                self.state, self.error = 'warming', None
+                self._thread = threading.Thread(target=self._warm, name='warm-up', daemon=True)
+                self._thread.start()
+            thread = self._thread
+        if wait:
+            thread.join()
+
+    def _warm(self):
+        try:
+            with self.app.app_context():
+                with self.phase('pool'):
+                    self._warm_pool()
+                with self.phase('templates'):
+                    self._warm_templates()
+            with self.phase('catalog'):
+                self._warm_catalog()
+        except Exception as e:
+            log.exception('warm-up failed')
+            self.state, self.error = 'failed', str(e)
+            return
+        self.ready_ms = round((time.monotonic() - self.started) * 1000, 1)
+        self.state = 'ready'
+        budget = self.app.config['STARTUP_BUDGET_MS']
+        if self.ready_ms > budget:
+            log.warning('ready after %.0f ms, over the %d ms budget (%s)', self.ready_ms, budget, self.phases)
+        else:
+            log.info('ready after %.0f ms (%s)', self.ready_ms, self.phases)
+
+    def _warm_pool(self):
+        # Primary only: a replica that is down must not keep the worker unready
+        engine = self.db.engine
+        size = getattr(engine.pool, 'size', lambda: 1)()
+        connections = []
+        try:
+            for _ in range(min(size, self.app.config['WARMUP_CONNECTIONS'])):
+                connection = engine.connect()
+                connections.append(connection)
+                connection.execute(text('SELECT 1'))
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def _warm_templates(self):
+        env = self.app.jinja_env
+        for name in env.list_templates(extensions=['html']):
+            env.get_template(name)
+
+    def _warm_catalog(self):
+        # Through the real views, so the cache holds exactly what requests will ask for
+        client = self.app.test_client()
+        for url in self.app.config['WARMUP_URLS']:
+            status = client.get(url).status_code
+            if status >= 500:
+                raise RuntimeError('%s answered %d during warm-up' % (url, status))
+
+    def live(self):
+        return jsonify({'status': 'ok'})
+
+    def ready(self):
+        # The first probe starts the warm-up if the launcher didn't
+        if self.state in ('starting', 'failed'):
+            self.warm_up()
+        return jsonify(self.stats()), 200 if self.state == 'ready' else 503
+
+    def stats(self):
+        budget = self.app.config['STARTUP_BUDGET_MS']
+        return {'status': self.state, 'schema_check': self.schema_check, 'ready_ms': self.ready_ms,
+                'budget_ms': budget, 'within_budget': self.ready_ms is not None and self.ready_ms <= budget,
+                'phases': dict(self.phases), 'error': self.error}
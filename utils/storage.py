@@ -0,0 +1,74 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# writer; synchronous=NORMAL is durable in WAL mode except for the last
+# transactions before a power loss; busy_timeout makes writers wait for the
+# lock instead of failing with "database is locked".
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative = KiB, i.e. 64 MiB per connection
+}
+
+
+def storage_profile(url):
+    """'sqlite', 'mysql' or 'default', from the database URL."""
+    backend = make_url(url).get_backend_name()
+    return backend if backend in ('sqlite', 'mysql') else 'default'
+
+
+def engine_options(url, env=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for the profile of `url`.
+
+    MySQL gets a sized connection pool that pings connections on checkout
+    and recycles them before the server's wait_timeout closes them
+    (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE).
+    SQLite keeps SQLAlchemy's defaults; it is tuned per connection by
+    init_storage().
+    """
+    if storage_profile(url) == 'mysql':
+        return {
+            'pool_size': int(env.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(env.get('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(env.get('DB_POOL_TIMEOUT', 10)),
+            'pool_recycle': int(env.get('DB_POOL_RECYCLE', 280)),
+            'pool_pre_ping': True,
+        }
+    return {}
+
+
+def init_storage(app, db):
+    """Apply the storage profile to the app's engines; call after db.init_app()."""
+    app.config.setdefault('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                apply_pragmas(engine, app.config['SQLITE_PRAGMAS'])
+                # Connections opened before the listener existed don't have the pragmas
+                engine.dispose()
+
+
+def apply_pragmas(engine, pragmas):
+    """Run `pragmas` on every new connection of a SQLite engine (for an
+    AsyncEngine, pass its sync_engine)."""
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+        cursor.close()
+
+    event.listen(engine, 'connect', _set_pragmas)
+
+
+def pool_stats(engine):
+    """Live connection pool numbers for /admin/metrics."""
+    pool = engine.pool
+    stats = {'profile': storage_profile(engine.url), 'pool': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
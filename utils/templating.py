@@ -0,0 +1,14 @@
+import os
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_bytecode_cache(app):
+    """Keep compiled templates on disk (JINJA_BYTECODE_CACHE_DIR, default
+    instance/jinja_cache) so a fresh worker loads them instead of compiling.
+    Entries are keyed by template name and source checksum, so an edited
+    template is recompiled; set the directory to '' to disable."""
+    app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    path = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if path:
+        os.makedirs(path, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(path)
@@ -0,0 +1,252 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from .metrics import Timer
+
+try:
+    import fcntl
+except ImportError:  # Windows: no journal locking, one process per journal
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    """Optional write-behind for contact-form messages.
+
+    With WRITE_BEHIND_ENABLED, submit() appends the message to a local
+    journal (fsync'd when WRITE_BEHIND_FSYNC) and to a bounded queue, and
+    returns at once; a background thread inserts queued messages in one
+    transaction per batch of up to WRITE_BEHIND_FLUSH_ROWS rows or every
+    WRITE_BEHIND_FLUSH_MS, whichever comes first. After each commit the
+    journal is marked, and truncated once the queue is empty. Journaled
+    messages that were never committed (crash, kill -9) are inserted again
+    by recover() or when the next process claims the journal, so delivery
+    is at-least-once. The queue is drained on interpreter exit.
+
+    Each process claims its own journal slot (`<journal>.0`, `.1`, ...)
+    with an exclusive lock, so forked workers never share a file. submit()
+    returns False when write-behind is off, no slot is free or the queue
+    is full; callers then write synchronously.
+    """
+
+    def __init__(self, db, Message, app=None):
+        self.db = db
+        self.Message = Message
+        self.app = None
+        self.enabled = False
+        self.flush_timer = Timer()
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._counts = {'submitted': 0, 'committed': 0, 'dropped': 0, 'queue_full': 0, 'recovered': 0, 'batches': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WRITE_BEHIND_ENABLED', False)
+        app.config.setdefault('WRITE_BEHIND_MAX_QUEUE', 10000)
+        app.config.setdefault('WRITE_BEHIND_FLUSH_MS', 200)
+        app.config.setdefault('WRITE_BEHIND_FLUSH_ROWS', 500)
+        app.config.setdefault('WRITE_BEHIND_FSYNC', True)
+        app.config.setdefault('WRITE_BEHIND_JOURNAL', os.path.join(app.instance_path, 'messages.journal'))
+        app.config.setdefault('WRITE_BEHIND_JOURNAL_SLOTS', 8)
+        self.app = app
+        self.enabled = bool(app.config['WRITE_BEHIND_ENABLED'])
+
+    # --- request side ---
+
+    def validate(self, row):
+        """Reject values the database would refuse later, while the caller can still get a 400."""
+        for name, value in row.items():
+            column = self.Message.__table__.c[name]
+            if not isinstance(value, str):
+                raise ValueError('%s must be a string' % name)
+            if getattr(column.type, 'length', None) and len(value) > column.type.length:
+                raise ValueError('%s must be at most %d characters' % (name, column.type.length))
+
+    def submit(self, row):
+        """Queue `row` (Message column values) for a later group commit.
+        Returns False if the caller should insert it synchronously instead."""
+        if not self.enabled or not self._ensure_started():
+            return False
+        self.validate(row)
+        with self._journal_lock:
+            if self._queue.full():
+                self._counts['queue_full'] += 1
+                return False
+            self._seq += 1
+            self._append({'seq': self._seq, 'row': row})
+            self._queue.put_nowait((self._seq, row))
+            self._counts['submitted'] += 1
+        return True
+
+    # --- journal ---
+
+    def _slots(self):
+        path = self.app.config['WRITE_BEHIND_JOURNAL']
+        return ['%s.%d' % (path, i) for i in range(self.app.config['WRITE_BEHIND_JOURNAL_SLOTS'])]
+
+    def _claim(self, path):
+        """Open and exclusively lock a journal file, or None if another process holds it."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        f = open(path, 'a+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return None
+        return f
+
+    def _append(self, record):
+        self._journal.write(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n')
+        self._journal.flush()
+        if self.app.config['WRITE_BEHIND_FSYNC']:
+            os.fsync(self._journal.fileno())
+
+    def _replay(self, f):
+        """Insert the journaled rows of `f` that have no commit marker, then empty it."""
+        f.seek(0)
+        pending, done = [], 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # torn final write; nothing after it was acknowledged
+            if 'done' in record:
+                done = max(done, record['done'])
+            else:
+                pending.append((record['seq'], record['row']))
+        rows = [row for seq, row in pending if seq > done]
+        if rows:
+            log.warning('write-behind: recovering %d journaled messages from %s', len(rows), f.name)
+            self._commit(rows)
+            self._counts['recovered'] += len(rows)
+        f.truncate(0)
+        f.flush()
+        return len(rows)
+
+    def recover(self):
+        """Replay every journal slot left behind by a process that is gone.
+        Call once at startup, after the tables exist."""
+        if not self.enabled:
+            return 0
+        recovered = 0
+        for path in self._slots():
+            if not os.path.exists(path):
+                continue
+            f = self._claim(path)
+            if f is not None:
+                with f:
+                    recovered += self._replay(f)
+        return recovered
+
+    # --- background flusher ---
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return self._journal is not None
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return self._journal is not None
+            # First use in this process (or in a freshly forked worker)
+            self._journal = None
+            for path in self._slots():
+                f = self._claim(path)
+                if f is not None:
+                    self._replay(f)
+                    self._journal = f
+                    break
+            else:
+                log.warning('write-behind: all journal slots are taken; writing messages synchronously')
+            self._seq = 0
+            self._queue = queue.Queue(self.app.config['WRITE_BEHIND_MAX_QUEUE'])
+            self._stopping = threading.Event()
+            if self._journal is not None:
+                self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+            self._pid = os.getpid()
+            return self._journal is not None
+
+    def _run(self):
+        interval = self.app.config['WRITE_BEHIND_FLUSH_MS'] / 1000.0
+        max_rows = self.app.config['WRITE_BEHIND_FLUSH_ROWS']
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + interval
+            while len(batch) < max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 and not self._stopping.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=max(remaining, 0)))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self.flush_timer.time():
+            self._commit([row for _, row in batch])
+        with self._journal_lock:
+            self._counts['batches'] += 1
+            self._append({'done': batch[-1][0]})
+            if self._queue.empty():
+                # Everything journaled so far is committed
+                self._journal.truncate(0)
+
+    def _commit(self, rows):
+        """Insert rows in one transaction; retry while the database is
+        unavailable or locked, and fall back to row by row if a row is bad."""
+        db, Message = self.db, self.Message
+        delay = 0.05
+        with self.app.app_context():
+            while True:
+                try:
+                    db.session.execute(insert(Message), rows)
+                    db.session.commit()
+                    self._counts['committed'] += len(rows)
+                    return
+                except OperationalError as e:
+                    db.session.rollback()
+                    log.warning('write-behind: batch of %d failed (%s); retrying in %.2fs', len(rows), e, delay)
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5.0)
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    break
+            for row in rows:
+                try:
+                    db.session.execute(insert(Message), [row])
+                    db.session.commit()
+                    self._counts['committed'] += 1
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    self._counts['dropped'] += 1
+                    log.error('write-behind: dropping message %r: %s', row, e)
+
+    def stop(self, timeout=10):
+        """Flush whatever is queued and stop the background thread."""
+        if self._pid != os.getpid() or self._journal is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        started = self._pid == os.getpid() and self._journal is not None
+        stats = dict(self._counts, enabled=self.enabled, running=started and self._thread.is_alive(),
+                     queue_depth=self._queue.qsize() if started else 0,
+                     queue_max=self.app.config['WRITE_BEHIND_MAX_QUEUE'] if self.app else None,
+                     journal=self._journal.name if started else None)
+        stats['flush'] = self.flush_timer.stats()
+        return stats